@@ -0,0 +1,116 @@
+# adaptive_stream.py
+
+import time
+
+import cv2
+
+# (JPEG quality, output scale, max fps), from best to most degraded
+LEVELS = [
+    (85, 1.0, 30),
+    (75, 1.0, 30),
+    (65, 1.0, 25),
+    (55, 0.75, 20),
+    (45, 0.75, 15),
+    (40, 0.5, 10),
+    (35, 0.5, 5),
+]
+
+
+def encode_jpeg(frame, quality, scale=1.0):
+    """JPEG-encodes the frame at the given quality after scaling it."""
+    if scale != 1.0:
+        frame = cv2.resize(
+            frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+        )
+    _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer
+
+
+class AdaptiveStream:
+    def __init__(
+        self,
+        target_latency=0.3,
+        max_buffered_bytes=512 * 1024,
+        recover_after=2.0,
+        degrade_cooldown=0.5,
+    ):
+        """
+        Adapts the JPEG quality, resolution and frame rate of one client to its link.
+
+        Args:
+            target_latency (float): Seconds from a frame being ready to the end of its send to stay under.
+            max_buffered_bytes (int): Unsent bytes in the socket buffer that count as congestion.
+            recover_after (float): Seconds of healthy sends before stepping back up one level.
+            degrade_cooldown (float): Seconds to wait after a step down before the next one,
+                so one burst does not drop straight to the lowest level.
+        """
+        self.target_latency = target_latency
+        self.max_buffered_bytes = max_buffered_bytes
+        self.recover_after = recover_after
+        self.degrade_cooldown = degrade_cooldown
+
+        self.level = 0
+        self.last_change = 0.0
+        self.healthy_since = None
+        self.last_sent = 0.0
+        self.latency = 0.0  # smoothed ready to sent latency
+        self.sent_frames = 0
+        self.skipped_frames = 0  # held back by the frame rate cap
+
+    @property
+    def quality(self):
+        return LEVELS[self.level][0]
+
+    @property
+    def scale(self):
+        return LEVELS[self.level][1]
+
+    @property
+    def fps(self):
+        return LEVELS[self.level][2]
+
+    def should_send(self, now=None):
+        """Checks the frame rate cap of the current level."""
+        now = time.time() if now is None else now
+        if now - self.last_sent < 1 / self.fps:
+            self.skipped_frames += 1
+            return False
+        self.last_sent = now
+        return True
+
+    def record_send(self, ready_at, buffered_bytes=0, now=None):
+        """Updates the latency estimate after a send and moves between levels."""
+        now = time.time() if now is None else now
+        self.sent_frames += 1
+        self.latency += 0.2 * ((now - ready_at) - self.latency)
+
+        congested = (
+            self.latency > self.target_latency
+            or buffered_bytes > self.max_buffered_bytes
+        )
+        if congested:
+            self.healthy_since = None
+            if (
+                self.level < len(LEVELS) - 1
+                and now - self.last_change >= self.degrade_cooldown
+            ):
+                self.level += 1
+                self.last_change = now
+            return
+
+        if self.healthy_since is None:
+            self.healthy_since = now
+        elif self.level > 0 and now - self.healthy_since >= self.recover_after:
+            self.level -= 1
+            self.last_change = now
+            self.healthy_since = now
+
+    def stats(self):
+        return {
+            "quality": self.quality,
+            "scale": self.scale,
+            "fps": self.fps,
+            "latency_ms": int(self.latency * 1000),
+            "sent_frames": self.sent_frames,
+            "skipped_frames": self.skipped_frames,
+        }
@@ -9,16 +9,21 @@ exports.getAlerts = async (req, res) => {
     }
 }
 
-exports.addAlert = async (req, res) => {
-    const alert = new Alert({
-        vehicleNumber: req.body.vehicleNumber,
-        speed: req.body.speed,
-        location: "Main Gate Road",
-        timestamp: new Date().toISOString(),
-    });
+const toAlert = (body) => new Alert({
+    vehicleNumber: body.vehicleNumber,
+    speed: body.speed,
+    location: "Main Gate Road",
+    timestamp: body.timestamp || new Date().toISOString(),
+});
 
+exports.addAlert = async (req, res) => {
     try {
-        const newAlert = await alert.save();
+        // The speed detection system posts its alerts in batches
+        if (Array.isArray(req.body)) {
+            const newAlerts = await Alert.insertMany(req.body.map(toAlert));
+            return res.status(201).json(newAlerts);
+        }
+        const newAlert = await toAlert(req.body).save();
         res.status(201).json(newAlert);
     } catch (error) {
         res.status(400).json({message: error.message});
@@ -0,0 +1,170 @@
+# feed_broadcaster.py
+
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from adaptive_stream import AdaptiveStream, encode_jpeg
+
+
+class Subscriber:
+    def __init__(self, queue_size, target_latency):
+        """One connected client: a small queue of the newest frame packets."""
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped_frames = 0
+        self.stream = AdaptiveStream(target_latency)
+
+    def offer(self, packet):
+        """Queues a packet without ever blocking, dropping the oldest one if the client is slow."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped_frames += 1
+        self.queue.put_nowait(packet)
+
+    async def get(self):
+        """Returns the next packet, or None once the feed has ended."""
+        return await self.queue.get()
+
+    def stats(self):
+        return {**self.stream.stats(), "dropped_frames": self.dropped_frames}
+
+
+class FeedBroadcaster:
+    def __init__(
+        self,
+        open_source,
+        process,
+        queue_size=2,
+        target_latency=0.3,
+        inference_executor=None,
+        encode_executor=None,
+    ):
+        """
+        Processes one feed once and fans the result out to every connected client.
+        Decoding, inference and JPEG encoding run on executors, never on the event loop.
+
+        Args:
+            open_source (callable): Returns a new iterable of frames (or frame, timestamp pairs).
+            process (callable): Turns an item of the source into (output frame, metadata dict).
+            queue_size (int): Packets kept per client before its oldest ones are dropped.
+            target_latency (float): Latency each client's adaptive stream tries to stay under.
+            inference_executor (Executor): Runs decode + process; must keep frames in order
+                (one worker), the tracker state depends on it.
+            encode_executor (Executor): Runs the JPEG encoding of the clients.
+        """
+        self.open_source = open_source
+        self.process = process
+        self.queue_size = queue_size
+        self.target_latency = target_latency
+        # Threads are enough: OpenCV and torch release the GIL in their heavy calls
+        self.inference_executor = inference_executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="inference"
+        )
+        self.encode_executor = encode_executor or ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="encode"
+        )
+
+        self.subscribers = set()
+        self.has_subscribers = asyncio.Event()
+        self.producer = None
+
+    def subscribe(self):
+        """Registers a client and starts the producer if it is not running."""
+        subscriber = Subscriber(self.queue_size, self.target_latency)
+        self.subscribers.add(subscriber)
+        self.has_subscribers.set()
+        if self.producer is None or self.producer.done():
+            self.producer = asyncio.ensure_future(self._produce())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        if not self.subscribers:
+            self.has_subscribers.clear()
+
+    def stats(self):
+        """Returns the quality, fps and dropped frames of every connected client."""
+        return [subscriber.stats() for subscriber in self.subscribers]
+
+    def _publish(self, packet):
+        for subscriber in list(self.subscribers):
+            subscriber.offer(packet)
+
+    async def encode(self, subscriber, packet):
+        """
+        Returns the JPEG of the packet at the subscriber's quality and scale. Clients on the
+        same level await the same encoding future, so a frame is encoded once per level.
+        """
+        key = (subscriber.stream.quality, subscriber.stream.scale)
+        encoding = packet["encodings"].get(key)
+        if encoding is None:
+            encoding = asyncio.get_running_loop().run_in_executor(
+                self.encode_executor, encode_jpeg, packet["frame"], *key
+            )
+            packet["encodings"][key] = encoding
+        return await encoding
+
+    def _process_next(self, frames):
+        # Runs on the inference executor: decode the next frame and process it
+        frame = next(frames, None)
+        if frame is None:
+            return None
+        captured_at = time.time()
+        output_frame, metadata = self.process(frame)
+        return captured_at, output_frame, metadata
+
+    async def _infer(self, frames, results):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # Idle, without decoding or inference, while nobody is watching
+                await self.has_subscribers.wait()
+
+                result = await loop.run_in_executor(
+                    self.inference_executor, self._process_next, frames
+                )
+                await results.put(result)
+                if result is None:
+                    return
+        except Exception as error:
+            print(f"Feed inference failed: {error}", file=sys.stderr)
+            await results.put(None)
+
+    async def _produce(self):
+        loop = asyncio.get_running_loop()
+        # Sources may be iterables (e.g. LatestFrameCapture) rather than iterators
+        source = self.open_source()
+        frames = iter(source)
+        # Inference of the next frame overlaps with encoding and sending of this one
+        results = asyncio.Queue(maxsize=2)
+        inference = asyncio.ensure_future(self._infer(frames, results))
+        frame_index = 0
+        try:
+            while True:
+                result = await results.get()
+                if result is None:
+                    break
+                captured_at, output_frame, metadata = result
+                self._publish(
+                    {
+                        "frame_index": frame_index,
+                        "timestamp": captured_at,
+                        "frame": output_frame,
+                        "metadata": metadata,
+                        "published_at": time.time(),
+                        # JPEG per (quality, scale), shared by the clients on that level
+                        "encodings": {},
+                    }
+                )
+                frame_index += 1
+        finally:
+            inference.cancel()
+            # Close the source itself, closing its iterator does not stop a capture thread
+            close = getattr(source, "close", None) or getattr(source, "release", None)
+            if close is not None:
+                # Queued behind any frame still being processed on the executor
+                await loop.run_in_executor(self.inference_executor, close)
+            # Tell every client that the feed has ended
+            self._publish(None)
+            print("Video generator closed")
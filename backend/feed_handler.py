@@ -0,0 +1,94 @@
+# feed_handler.py
+#
+# Per-feed processing and the WebSocket client handler, shared by feed_model.py (one
+# feed per process) and feed_supervisor.py (every feed in one process).
+
+import sys
+
+import cv2
+import websockets
+
+from frame_protocol import encode_binary_frame, encode_json_frame, parse_feed_path
+
+
+def overspeeding_data(vehicle_states):
+    return [
+        {
+            "vehicle_id": int(state),
+            "number_plate": vehicle_states[state].number_plate,
+            "max_speed": int(vehicle_states[state].max_speed),
+        }
+        for state in vehicle_states
+        # Same speed the alerts are checked against
+        if vehicle_states[state].alert_speed > 30
+    ]
+
+
+def frame_processor(system):
+    """Returns the FeedBroadcaster `process` callable of a SpeedDetectionSystem."""
+
+    def process_frame(item):
+        """Runs the feed's system on a (frame, timestamp) and returns (output frame, metadata)."""
+        frame, timestamp = item
+        processed_frame, vehicle_states = system.process_frame(frame, timestamp)
+        # Largest output size, each client is scaled down from it by its adaptive stream
+        frame = cv2.resize(processed_frame, (1280, 720))
+        return frame, {"overspeeding_data": overspeeding_data(vehicle_states)}
+
+    return process_frame
+
+
+async def send_video(websocket, path, feedId, broadcaster):
+    path, binary = parse_feed_path(path)
+    if path != f"/{feedId}":
+        await websocket.close()
+        print(f"Unsupported path: {path}", file=sys.stderr)
+        return
+
+    print(
+        f"Accepted connection on path: {path} with feedId: {feedId}"
+        f" ({'binary' if binary else 'json'} frames)"
+    )
+
+    # Every client shares the one processed stream of the feed
+    subscriber = broadcaster.subscribe()
+    stream = subscriber.stream
+    transport = getattr(websocket, "transport", None)
+    try:
+        while True:
+            packet = await subscriber.get()
+            if packet is None:
+                break
+            # Frame rate cap of the client's current level
+            if not stream.should_send():
+                continue
+
+            # Encode the frame to JPEG at the client's quality and resolution
+            buffer = await broadcaster.encode(subscriber, packet)
+            metadata = {**packet["metadata"], "stream": subscriber.stats()}
+            if binary:
+                # Header + compact metadata + raw JPEG in one binary message
+                message = encode_binary_frame(
+                    feedId, packet["frame_index"], buffer, metadata, packet["timestamp"]
+                )
+            else:
+                # Create the message with feedId and frame data
+                message = encode_json_frame(
+                    feedId,
+                    buffer,
+                    metadata["overspeeding_data"],
+                    metadata["stream"],
+                )
+            await websocket.send(message)
+
+            # Back off when the link cannot keep up, recover when it can. Latency is
+            # counted from when the frame was ready, inference time is not the link's fault
+            stream.record_send(
+                packet["published_at"],
+                transport.get_write_buffer_size() if transport is not None else 0,
+            )
+    except websockets.exceptions.ConnectionClosed:
+        print("WebSocket connection closed", file=sys.stderr)
+    finally:
+        broadcaster.unsubscribe(subscriber)
+        print(f"Client of {feedId} left: {subscriber.stats()}")
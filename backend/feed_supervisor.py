@@ -0,0 +1,157 @@
+# feed_supervisor.py
+#
+# Hosts every feed of a config file in one process: the models are loaded once and
+# shared (with inference batched across the cameras), while each feed keeps its own
+# SpeedDetectionSystem, i.e. its own tracker, speed and plate state.
+#
+#   python feed_supervisor.py [feeds.yaml]
+
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import websockets
+import yaml
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from utils.AlertDispatcher import AlertDispatcher
+from utils.ImageSizePolicy import CHAR_BUCKETS, PLATE_BUCKETS, ImageSizePolicy
+from utils.ModelRegistry import ModelRegistry
+from utils.SharedFrameRing import start_capture_process
+from utils.SpeedDetectionSystem import SpeedDetectionSystem
+from feed_broadcaster import FeedBroadcaster
+from feed_handler import frame_processor, send_video
+from frame_protocol import feed_number
+
+
+def _resolve(base_dir, path):
+    # Camera indexes and stream URLs are kept as they are
+    if isinstance(path, int) or "://" in path:
+        return path
+    return os.path.normpath(os.path.join(base_dir, path))
+
+
+def load_config(config_path):
+    with open(config_path) as config_file:
+        config = yaml.safe_load(config_file)
+
+    base_dir = os.path.dirname(os.path.abspath(config_path))
+    config["models"] = {
+        name: _resolve(base_dir, path) for name, path in config["models"].items()
+    }
+    for feed in config["feeds"]:
+        feed["source"] = _resolve(base_dir, feed["source"])
+        feed.setdefault("mask", feed["source"] != 0)
+        feed.setdefault("port", 3000 + feed_number(feed["id"]))
+    return config
+
+
+def ring_frames(source, shape, slots=4):
+    """Decodes the source in a capture process and yields its frames from shared memory."""
+    process, ring = start_capture_process(source, shape, slots)
+    try:
+        yield from ring.iter_frames(timestamps=True)
+    finally:
+        process.terminate()
+        process.join()
+        ring.unlink()
+
+
+class FeedSupervisor:
+    def __init__(self, config):
+        """
+        Args:
+            config (dict): Parsed feeds config, see feeds.yaml.
+        """
+        batching = config.get("batching", {})
+        self.registry = ModelRegistry(
+            max_batch=batching.get("max_batch", 8),
+            max_wait=batching.get("max_wait_ms", 10) / 1000,
+            backend_options=config.get("backend"),
+        )
+        models = config["models"]
+        # One alert queue and HTTP session for every feed
+        self.alert_dispatcher = AlertDispatcher(config["api_url"])
+        self.feeds = []
+
+        for feed in config["feeds"]:
+            size_policies = {}
+            if config.get("bucketed_sizes", False):
+                size_policies = {
+                    "plate_size_policy": ImageSizePolicy(PLATE_BUCKETS),
+                    "char_size_policy": ImageSizePolicy(CHAR_BUCKETS),
+                }
+            system = SpeedDetectionSystem(
+                feed["source"],
+                models["plate"],
+                models["char"],
+                models["vehicle"],
+                config["api_url"],
+                feed["mask"],
+                model_registry=self.registry,
+                alert_dispatcher=self.alert_dispatcher,
+                vehicle_imgsz=feed.get(
+                    "vehicle_imgsz", config.get("vehicle_imgsz", 640)
+                ),
+                **size_policies,
+                # Batches merge the feeds' crops, warm the batch sizes they will see
+                warmup_max_batch=min(4, batching.get("max_batch", 8)),
+            )
+            broadcaster = FeedBroadcaster(
+                self._frame_source(feed, system),
+                frame_processor(system),
+                target_latency=feed.get("target_latency", 0.3),
+                # One inference thread per feed keeps its frames in order, and lets the
+                # feeds' requests meet in the shared models' batches
+                inference_executor=ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=f"inference-{feed['id']}"
+                ),
+            )
+            self.feeds.append((feed, system, broadcaster))
+
+    @staticmethod
+    def _frame_source(feed, system):
+        source = feed["source"]
+        if feed.get("capture_process", False):
+            # Decoding (4K RTSP especially) in its own process, frames handed over
+            # through a shared memory ring instead of being pickled
+            width, height = system.video_info.resolution_wh
+            slots = feed.get("ring_slots", 4)
+            return lambda: ring_frames(source, (height, width, 3), slots)
+        return lambda: system.frames(timestamps=True)
+
+    async def serve(self):
+        for feed, _, broadcaster in self.feeds:
+            await websockets.serve(
+                lambda ws, path, feedId=feed["id"], broadcaster=broadcaster: send_video(
+                    ws, path, feedId, broadcaster
+                ),
+                "0.0.0.0",
+                feed["port"],
+            )
+            print(
+                f"Python WebSocket server for {feed['id']} started on "
+                f"ws://0.0.0.0:{feed['port']}/{feed['id']}"
+            )
+
+    def close(self):
+        self.alert_dispatcher.close()
+        self.registry.close()
+
+
+if __name__ == "__main__":
+    config_path = (
+        sys.argv[1]
+        if len(sys.argv) > 1
+        else os.path.join(os.path.dirname(__file__), "feeds.yaml")
+    )
+    supervisor = FeedSupervisor(load_config(config_path))
+    try:
+        asyncio.get_event_loop().run_until_complete(supervisor.serve())
+        asyncio.get_event_loop().run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.close()
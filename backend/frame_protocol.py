@@ -0,0 +1,80 @@
+# frame_protocol.py
+#
+# Wire formats of the video feed WebSockets.
+#
+# JSON (default, old clients):
+#   {"type": "videoFrame", "data": {"feedId", "frame": <base64 JPEG>, "overspeeding_data"}}
+#
+# Binary (ws://host:port/<feedId>?format=binary), one binary message per frame:
+#   header   : version (u8), feed number (u16), frame index (u32),
+#              timestamp in seconds (f64), metadata length (u32) -- big endian, 19 bytes
+#   metadata : compact UTF-8 JSON, e.g. {"overspeeding_data": [...], "stream": {...}}
+#   frame    : raw JPEG bytes up to the end of the message
+
+import base64
+import json
+import struct
+import time
+from urllib.parse import parse_qs, urlsplit
+
+HEADER = struct.Struct("!BHIdI")
+VERSION = 1
+
+
+def parse_feed_path(path):
+    """Splits a request path into (path without query, True if binary framing was asked for)."""
+    url = urlsplit(path)
+    return url.path, parse_qs(url.query).get("format") == ["binary"]
+
+
+def feed_number(feed_id):
+    """Returns the number of a feed id such as 'feed16'."""
+    return int(feed_id.replace("feed", ""))
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(",", ":"))
+
+
+def encode_binary_frame(feed_id, frame_index, jpeg, metadata, timestamp=None):
+    """Builds a binary frame message from the encoded JPEG buffer and its metadata."""
+    if timestamp is None:
+        timestamp = time.time()
+    try:
+        metadata = _dumps(metadata).encode("utf-8")
+    except TypeError:
+        metadata = _dumps({"overspeeding_data": []}).encode("utf-8")
+    header = HEADER.pack(
+        VERSION, feed_number(feed_id), frame_index % 2**32, timestamp, len(metadata)
+    )
+    # bytes.join takes the numpy JPEG buffer directly, no intermediate copy
+    return b"".join((header, metadata, jpeg))
+
+
+def decode_binary_frame(message):
+    """Splits a binary frame message into (header dict, metadata dict, JPEG bytes)."""
+    version, feed, frame_index, timestamp, metadata_length = HEADER.unpack_from(message)
+    metadata_end = HEADER.size + metadata_length
+    header = {
+        "version": version,
+        "feedId": f"feed{feed}",
+        "frame_index": frame_index,
+        "timestamp": timestamp,
+    }
+    metadata = json.loads(bytes(message[HEADER.size : metadata_end]))
+    return header, metadata, bytes(message[metadata_end:])
+
+
+def encode_json_frame(feed_id, jpeg, overspeeding_data=None, stream=None):
+    """Builds the JSON frame message understood by the existing clients."""
+    frame_data = base64.b64encode(jpeg).decode("utf-8")
+    data = {"feedId": feed_id, "frame": frame_data}
+    if overspeeding_data is not None:
+        data["overspeeding_data"] = overspeeding_data
+    if stream is not None:
+        data["stream"] = stream
+    try:
+        return json.dumps({"type": "videoFrame", "data": data})
+    except TypeError:
+        data["overspeeding_data"] = []
+        return json.dumps({"type": "videoFrame", "data": data})
@@ -0,0 +1,88 @@
+import argparse
+import csv
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from quantize_models import image_paths, read_images
+from utils.ANPRPipelineWithTracking import ANPRPipelineWithTracking
+from utils.ImageSizePolicy import CHAR_BUCKETS, ImageSizePolicy
+from utils.InferenceBackend import load_model
+
+
+def read_text(char_model, image, imgsz):
+    result = char_model(image, verbose=False, imgsz=imgsz)[0]
+    return "".join(ANPRPipelineWithTracking._characters_from_result(result))
+
+
+def crop_bucket(image, policy):
+    """Name of the size bucket of a crop, e.g. "<=160px"."""
+    longest_side = max(image.shape[:2])
+    for max_side, _ in policy.buckets:
+        if longest_side <= max_side:
+            return f"<={max_side}px"
+    return f">{policy.buckets[-1][0]}px" if policy.buckets else "all"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Plate reading accuracy and latency of the character model per inference size"
+    )
+    parser.add_argument("--char-model", default="best_char_200.pt")
+    parser.add_argument("--crops", required=True, help="Folder of plate crops")
+    parser.add_argument(
+        "--labels", help="CSV of filename,plate text of the crops for the exact match"
+    )
+    parser.add_argument("--sizes", type=int, nargs="*", default=[160, 224, 320, 640])
+    parser.add_argument("--reference", type=int, default=640)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    char_model = load_model(args.char_model)
+    paths, images = read_images(image_paths(args.crops, args.limit))
+    names = [os.path.basename(path) for path in paths]
+    labels = {}
+    if args.labels:
+        with open(args.labels) as labels_file:
+            labels = {
+                row[0]: row[1] for row in csv.reader(labels_file) if len(row) >= 2
+            }
+    policy = ImageSizePolicy(CHAR_BUCKETS)
+    buckets = [crop_bucket(image, policy) for image in images]
+    print(f"{len(images)} plate crops from {args.crops}")
+
+    candidates = [(str(imgsz), ImageSizePolicy.fixed(imgsz)) for imgsz in args.sizes]
+    candidates.append(("policy", policy))
+    reference = [read_text(char_model, image, args.reference) for image in images]
+
+    for name, candidate in candidates:
+        for image in images[:3]:  # warm-up
+            read_text(char_model, image, candidate.imgsz_for(image))
+
+        texts, latencies = [], []
+        for image in images:
+            start = time.perf_counter()
+            texts.append(read_text(char_model, image, candidate.imgsz_for(image)))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        # Agreement with the reference size and exact match, per crop size bucket
+        per_bucket = defaultdict(list)
+        for i, text in enumerate(texts):
+            exact = text == labels[names[i]] if names[i] in labels else None
+            per_bucket[buckets[i]].append((text == reference[i], exact, latencies[i]))
+
+        print(
+            f"imgsz {name:>6}: {np.mean(latencies):.1f} ms per crop, "
+            f"{np.mean([a == b for a, b in zip(texts, reference)]):.1%} "
+            f"same text as {args.reference}"
+        )
+        for bucket, rows in sorted(per_bucket.items()):
+            agreement, exact, bucket_latencies = zip(*rows)
+            exact = [match for match in exact if match is not None]
+            exact_text = f", {np.mean(exact):.1%} exact" if exact else ""
+            print(
+                f"  {bucket:>7} ({len(rows)} crops): {np.mean(bucket_latencies):.1f} ms, "
+                f"{np.mean(agreement):.1%} agreement{exact_text}"
+            )
@@ -0,0 +1,79 @@
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# (name, module, directory it is imported from)
+ENTRY_POINTS = [
+    ("run_speed.py", "run_speed", ROOT),
+    ("speed_anpr.py", "speed_anpr", ROOT),
+    ("backend/feed_model.py", "feed_model", os.path.join(ROOT, "backend")),
+    ("backend/feed_supervisor.py", "feed_supervisor", os.path.join(ROOT, "backend")),
+    ("SpeedDetectionSystem", "utils.SpeedDetectionSystem", ROOT),
+]
+
+
+def _import_lines(code, cwd):
+    """Runs the code with `-X importtime`, returns (stdout, [(self us, module name)])."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+
+    # Lines look like "import time:   self [us] |  cumulative | imported package"
+    lines = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        if self_us.strip().isdigit():  # skips the header
+            lines.append((int(self_us), name.strip()))
+    return process.stdout, lines
+
+
+def import_time(module, cwd, startup_modules=()):
+    """
+    Imports the module in a fresh interpreter. Returns the wall time of the import in
+    seconds, and the time spent importing each top-level package (modules the bare
+    interpreter already loads at startup left out).
+    """
+    code = (
+        "import sys, time; sys.path.insert(0, '.'); start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    stdout, lines = _import_lines(code, cwd)
+    packages = defaultdict(float)
+    for self_us, name in lines:
+        if name not in startup_modules:
+            packages[name.split(".")[0]] += self_us / 1e6
+    return float(stdout.strip().splitlines()[-1]), packages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import time of the pipeline entry points, with the slowest packages"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Best of N fresh imports")
+    parser.add_argument("--top", type=int, default=8, help="Packages listed per entry")
+    args = parser.parse_args()
+
+    startup_modules = {name for _, name in _import_lines("pass", ROOT)[1]}
+    for name, module, cwd in ENTRY_POINTS:
+        try:
+            runs = [import_time(module, cwd, startup_modules) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name}: import failed ({e})")
+            continue
+        seconds, packages = min(runs, key=lambda run: run[0])
+        print(f"{name}: {seconds * 1000:.0f} ms")
+        for package, package_seconds in sorted(
+            packages.items(), key=lambda item: -item[1]
+        )[: args.top]:
+            print(f"  {package:<24} {package_seconds * 1000:8.0f} ms")
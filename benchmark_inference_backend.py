@@ -0,0 +1,160 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from utils.InferenceBackend import load_model
+
+
+def load_images(source, limit):
+    """Reads the images of a folder, or frames of a video, as BGR arrays."""
+    if os.path.isdir(source):
+        paths = sorted(
+            path
+            for extension in ("jpg", "jpeg", "png", "bmp")
+            for path in glob.glob(os.path.join(source, f"*.{extension}"))
+        )
+        return [cv2.imread(path) for path in paths[:limit]]
+
+    capture = cv2.VideoCapture(source)
+    images = []
+    while len(images) < limit:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        images.append(frame)
+    capture.release()
+    return images
+
+
+def detections(result):
+    boxes = result.boxes
+    return (
+        boxes.xyxy.cpu().numpy(),
+        boxes.conf.cpu().numpy(),
+        boxes.cls.cpu().numpy().astype(int),
+    )
+
+
+def box_iou(a, b):
+    """IoU matrix of two sets of xyxy boxes."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+def compare(reference, candidate, iou_threshold):
+    """Greedily matches the candidate boxes to the reference ones of the same class."""
+    ref_boxes, ref_conf, ref_cls = reference
+    boxes, conf, cls = candidate
+    if len(ref_boxes) == 0 or len(boxes) == 0:
+        return [], [], len(ref_boxes), len(boxes)
+
+    iou = box_iou(ref_boxes, boxes) * (ref_cls[:, None] == cls[None, :])
+    ious, conf_deltas = [], []
+    used = np.zeros(len(boxes), dtype=bool)
+    for i in np.argsort(-ref_conf):
+        candidates = np.where(~used & (iou[i] >= iou_threshold))[0]
+        if len(candidates) == 0:
+            continue
+        j = candidates[np.argmax(iou[i, candidates])]
+        used[j] = True
+        ious.append(iou[i, j])
+        conf_deltas.append(abs(ref_conf[i] - conf[j]))
+    return ious, conf_deltas, len(ref_boxes) - len(ious), len(boxes) - len(ious)
+
+
+def time_model(model, images, runs, **kwargs):
+    for image in images[:3]:  # warm-up
+        model(image, verbose=False, **kwargs)
+    latencies = []
+    for _ in range(runs):
+        for image in images:
+            start = time.perf_counter()
+            model(image, verbose=False, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Parity and latency of an exported ONNX model against its PyTorch weights"
+    )
+    parser.add_argument(
+        "--weights", required=True, help="PyTorch weights, e.g. best_l.pt"
+    )
+    parser.add_argument(
+        "--onnx", help="Exported model, exported next to the weights if missing"
+    )
+    parser.add_argument("--source", required=True, help="Image folder or video")
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument(
+        "--threads", type=int, default=None, help="ONNX intra-op threads"
+    )
+    parser.add_argument("--iou", type=float, default=0.9, help="IoU of a matching box")
+    parser.add_argument(
+        "--min-mean-iou", type=float, default=0.9, help="Parity fails below it"
+    )
+    parser.add_argument(
+        "--max-conf-delta", type=float, default=0.05, help="Parity fails above it"
+    )
+    args = parser.parse_args()
+
+    torch_model = load_model(args.weights)
+    onnx_path = args.onnx or os.path.splitext(args.weights)[0] + ".onnx"
+    if not os.path.exists(onnx_path):
+        onnx_path = torch_model.export(format="onnx", imgsz=args.imgsz)
+    onnx_model = load_model(onnx_path, intra_op_threads=args.threads)
+
+    images = load_images(args.source, args.images)
+    print(f"{len(images)} images from {args.source}")
+
+    ious, conf_deltas, missing, extra = [], [], 0, 0
+    for image in images:
+        image_ious, image_deltas, image_missing, image_extra = compare(
+            detections(torch_model(image, verbose=False, imgsz=args.imgsz)[0]),
+            detections(onnx_model(image)[0]),
+            args.iou,
+        )
+        ious += image_ious
+        conf_deltas += image_deltas
+        missing += image_missing
+        extra += image_extra
+
+    print(
+        f"Parity: {len(ious)} matched boxes, {missing} missing, {extra} extra, "
+        f"mean IoU {np.mean(ious) if ious else 0:.4f}, "
+        f"max confidence delta {max(conf_deltas, default=0):.4f}"
+    )
+
+    # Gate the export: every box found by both, at the same place and confidence
+    failures = []
+    if not ious:
+        failures.append("no matched boxes to compare, check --source")
+    if missing or extra:
+        failures.append(f"{missing} missing and {extra} extra boxes")
+    if ious and np.mean(ious) < args.min_mean_iou:
+        failures.append(f"mean IoU {np.mean(ious):.4f} < {args.min_mean_iou}")
+    if max(conf_deltas, default=0) > args.max_conf_delta:
+        failures.append(
+            f"confidence delta {max(conf_deltas):.4f} > {args.max_conf_delta}"
+        )
+    if failures:
+        print(f"Parity FAILED: {', '.join(failures)}")
+        sys.exit(1)
+    print("Parity passed")
+
+    torch_p50, torch_p95 = time_model(torch_model, images, args.runs, imgsz=args.imgsz)
+    onnx_p50, onnx_p95 = time_model(onnx_model, images, args.runs)
+    print(f"PyTorch      : p50 {torch_p50:.1f} ms, p95 {torch_p95:.1f} ms per image")
+    print(f"ONNX Runtime : p50 {onnx_p50:.1f} ms, p95 {onnx_p95:.1f} ms per image")
+    print(f"Speedup      : {torch_p50 / onnx_p50:.2f}x")
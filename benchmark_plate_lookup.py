@@ -0,0 +1,109 @@
+import argparse
+import random
+import string
+import time
+
+from utils.ConfusionWeightedDistance import DEFAULT_SUBSTITUTION_COSTS
+from utils.NumberPlatePredictor import NumberPlatePredictor
+from utils.PlateIndex import PlateIndex
+
+STATES = ["PB", "HR", "CH", "HP", "UP", "DL", "RJ", "JK"]
+
+
+def random_plate(rng):
+    """Generates a plate in the usual SS00XX0000 format."""
+    return (
+        rng.choice(STATES)
+        + f"{rng.randint(1, 99):02d}"
+        + "".join(rng.choices(string.ascii_uppercase, k=rng.randint(1, 2)))
+        + f"{rng.randint(0, 9999):04d}"
+    )
+
+
+def misread(plate, rng, edits):
+    """Simulates an OCR read of the plate with a few wrong characters."""
+    chars = list(plate)
+    for _ in range(edits):
+        chars[rng.randrange(len(chars))] = rng.choice(
+            string.ascii_uppercase + string.digits
+        )
+    return "".join(chars)
+
+
+def confused_read(plate, rng, edits):
+    """Simulates an OCR read that swaps characters the char model often confuses."""
+    chars = list(plate)
+    for _ in range(edits):
+        positions = [
+            i
+            for i, char in enumerate(chars)
+            if any(char in pair for pair in DEFAULT_SUBSTITUTION_COSTS)
+        ]
+        if not positions:
+            break
+        i = rng.choice(positions)
+        pair = rng.choice(
+            [pair for pair in DEFAULT_SUBSTITUTION_COSTS if chars[i] in pair]
+        )
+        chars[i] = pair[1] if chars[i] == pair[0] else pair[0]
+    return "".join(chars)
+
+
+def time_lookups(lookup, queries):
+    start = time.perf_counter()
+    results = [lookup(query) for query in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plate lookup benchmark")
+    parser.add_argument("--plates", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-queries", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    plates = list({random_plate(rng) for _ in range(args.plates)})
+    queries = [
+        misread(rng.choice(plates), rng, rng.randint(0, 2)) for _ in range(args.queries)
+    ]
+
+    start = time.perf_counter()
+    predictor = NumberPlatePredictor(existing_plates=plates)
+    print(f"Index build: {time.perf_counter() - start:.2f} s for {len(plates)} plates")
+
+    index_ms, index_results = time_lookups(predictor.get_similar_plate, queries)
+
+    # The linear scan is slow, so only time a slice of the queries
+    scan_queries = queries[: args.scan_queries]
+    scan_ms, scan_results = time_lookups(
+        predictor.get_similar_plate_linear, scan_queries
+    )
+
+    agree = sum(
+        scan_plate == index_plate
+        for (scan_plate, _), (index_plate, _) in zip(scan_results, index_results)
+    )
+    print(f"Linear scan: {scan_ms:.3f} ms / lookup")
+    print(f"Plate index: {index_ms:.3f} ms / lookup ({scan_ms / index_ms:.0f}x faster)")
+    print(f"Same best plate on {agree}/{len(scan_results)} scanned queries")
+
+    # Match accuracy on OCR confusions, plain vs confusion weighted edit distance
+    truths = [rng.choice(plates) for _ in range(args.queries)]
+    reads = [confused_read(plate, rng, rng.randint(1, 3)) for plate in truths]
+    plain_index = PlateIndex(plates)
+    for name, lookup in [
+        ("Plain edit distance", plain_index.closest),
+        ("Confusion weighted", predictor.get_similar_plate),
+    ]:
+        lookup_ms, results = time_lookups(lookup, reads)
+        correct = sum(plate == truth for (plate, _), truth in zip(results, truths))
+        accepted = sum(
+            plate == truth and similarity > 0.75
+            for (plate, similarity), truth in zip(results, truths)
+        )
+        print(
+            f"{name}: {correct}/{len(reads)} correct, {accepted} above the 0.75 "
+            f"threshold, {lookup_ms:.3f} ms / lookup"
+        )
@@ -0,0 +1,218 @@
+import argparse
+import csv
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from utils.ANPRPipelineWithTracking import ANPRPipelineWithTracking
+from utils.InferenceBackend import OnnxYOLO, load_model
+
+
+def image_paths(folder, limit=None):
+    paths = sorted(
+        path
+        for extension in ("jpg", "jpeg", "png", "bmp")
+        for path in glob.glob(os.path.join(folder, f"*.{extension}"))
+    )
+    return paths[:limit]
+
+
+def read_images(paths):
+    """Reads the images, returning (readable paths, images)."""
+    images = [(path, cv2.imread(path)) for path in paths]
+    images = [(path, image) for path, image in images if image is not None]
+    return [path for path, _ in images], [image for _, image in images]
+
+
+class CropCalibrationReader:
+    """Feeds our own crops, letterboxed like at inference time, to the calibrator."""
+
+    def __init__(self, model_path, images):
+        session = OnnxYOLO(model_path)
+        self.input_name = session.input_name
+        self.imgsz = session.imgsz
+        self.images = iter(images)
+
+    def get_next(self):
+        image = next(self.images, None)
+        if image is None:
+            return None
+        letterboxed, _, _ = OnnxYOLO.letterbox(image, self.imgsz)
+        blob = letterboxed[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255
+        return {self.input_name: blob}
+
+
+def export_onnx(weights, imgsz):
+    """Returns the FP32 ONNX graph of the weights, exporting it next to them if needed."""
+    if weights.endswith(".onnx"):
+        return weights
+    onnx_path = os.path.splitext(weights)[0] + ".onnx"
+    if not os.path.exists(onnx_path):
+        onnx_path = load_model(weights).export(format="onnx", imgsz=imgsz)
+    return onnx_path
+
+
+def quantize(onnx_path, images, keep_float, per_channel=True):
+    """Writes `<name>_int8.onnx` calibrated on the images and returns its path."""
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    base = os.path.splitext(onnx_path)[0]
+    prepared_path = base + "_prepared.onnx"
+    int8_path = base + "_int8.onnx"
+    quant_pre_process(onnx_path, prepared_path)
+
+    # Box decoding (DFL) and the final concat lose too much precision in INT8
+    nodes_to_exclude = [
+        node.name
+        for node in onnx.load(prepared_path).graph.node
+        if any(pattern in node.name for pattern in keep_float)
+    ]
+    quantize_static(
+        prepared_path,
+        int8_path,
+        CropCalibrationReader(onnx_path, images),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=per_channel,
+        calibrate_method=CalibrationMethod.Percentile,
+        nodes_to_exclude=nodes_to_exclude,
+    )
+    os.remove(prepared_path)
+
+    # Keep the class names and input size ultralytics stores in the graph
+    fp32_model, int8_model = onnx.load(onnx_path), onnx.load(int8_path)
+    onnx.helper.set_model_props(
+        int8_model, {prop.key: prop.value for prop in fp32_model.metadata_props}
+    )
+    onnx.save(int8_model, int8_path)
+    return int8_path
+
+
+def read_plate(plate_model, char_model, image):
+    """Plate text of an image: the most confident plate box if any, else the whole image as the plate."""
+    result = plate_model(image, verbose=False)[0]
+    boxes = result.boxes.xyxy.cpu().numpy()
+    if len(boxes):
+        x1, y1, x2, y2 = boxes[np.argmax(result.boxes.conf.cpu().numpy())].astype(int)
+        if x2 > x1 and y2 > y1:
+            image = image[y1:y2, x1:x2]
+    characters = ANPRPipelineWithTracking._characters_from_result(
+        char_model(image, verbose=False)[0]
+    )
+    return "".join(characters)
+
+
+def mean_latency(model, images):
+    for image in images[:3]:
+        model(image, verbose=False)
+    start = time.perf_counter()
+    for image in images:
+        model(image, verbose=False)
+    return (time.perf_counter() - start) / len(images) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="INT8 post-training quantization of the plate and character models"
+    )
+    parser.add_argument("--plate-model", default="best_l.pt")
+    parser.add_argument("--char-model", default="best_char_200.pt")
+    parser.add_argument(
+        "--calibration",
+        required=True,
+        help="Folder of our plate crops, e.g. the output of saving_numberplates_from_videos.py",
+    )
+    parser.add_argument(
+        "--plate-calibration",
+        help="Folder of vehicle crops or frames for the plate detector (default: --calibration)",
+    )
+    parser.add_argument(
+        "--eval", help="Folder of evaluation images (default: the calibration crops)"
+    )
+    parser.add_argument(
+        "--labels", help="CSV of filename,plate text of the evaluation images"
+    )
+    parser.add_argument("--calibration-size", type=int, default=300)
+    parser.add_argument("--plate-imgsz", type=int, default=640)
+    parser.add_argument("--char-imgsz", type=int, default=640)
+    parser.add_argument(
+        "--keep-float",
+        nargs="*",
+        default=["/dfl/", "/model.23/Concat_5", "/model.22/Concat_5"],
+        help="Node name patterns left in floating point",
+    )
+    args = parser.parse_args()
+
+    _, char_images = read_images(image_paths(args.calibration, args.calibration_size))
+    plate_images = (
+        read_images(image_paths(args.plate_calibration, args.calibration_size))[1]
+        if args.plate_calibration
+        else char_images
+    )
+    print(
+        f"Calibrating on {len(char_images)} plate crops, {len(plate_images)} plate detector images"
+    )
+
+    models = {}
+    for name, weights, imgsz, images in (
+        ("plate", args.plate_model, args.plate_imgsz, plate_images),
+        ("char", args.char_model, args.char_imgsz, char_images),
+    ):
+        fp32_path = export_onnx(weights, imgsz)
+        int8_path = quantize(fp32_path, images, args.keep_float)
+        print(f"{name}: {fp32_path} -> {int8_path}")
+        models[name] = (load_model(fp32_path), load_model(int8_path))
+
+    eval_paths, eval_images = read_images(image_paths(args.eval or args.calibration))
+    labels = {}
+    if args.labels:
+        with open(args.labels) as labels_file:
+            labels = {
+                row[0]: row[1] for row in csv.reader(labels_file) if len(row) >= 2
+            }
+
+    fp32_texts = [
+        read_plate(models["plate"][0], models["char"][0], image)
+        for image in eval_images
+    ]
+    int8_texts = [
+        read_plate(models["plate"][1], models["char"][1], image)
+        for image in eval_images
+    ]
+    agreement = np.mean([a == b for a, b in zip(fp32_texts, int8_texts)])
+    print(
+        f"Plate text identical between FP32 and INT8: {agreement:.1%} of {len(eval_images)}"
+    )
+
+    if labels:
+        # Exact match of the whole plate text against the ground truth
+        names = [os.path.basename(path) for path in eval_paths]
+        labelled = [i for i, name in enumerate(names) if name in labels]
+        for precision, texts in (("FP32", fp32_texts), ("INT8", int8_texts)):
+            exact = np.mean([texts[i] == labels[names[i]] for i in labelled])
+            print(
+                f"{precision} plate exact match: {exact:.1%} of {len(labelled)} labelled"
+            )
+
+    for name, (fp32_model, int8_model) in models.items():
+        images = eval_images if name == "char" else plate_images
+        fp32_ms = mean_latency(fp32_model, images)
+        int8_ms = mean_latency(int8_model, images)
+        print(
+            f"{name}: FP32 {fp32_ms:.1f} ms, INT8 {int8_ms:.1f} ms per image, "
+            f"{fp32_ms / int8_ms:.2f}x speedup"
+        )
+    print(
+        "Point plate_model_path / char_model_path at the *_int8.onnx files to use them."
+    )
@@ -11,19 +11,23 @@ yolo_model_path = "yolo11n.pt"
 api_url = "http://example.com/api/alerts"
 
 
-# Create the system
-system = SpeedDetectionSystem(
-    video_path, plate_model_path, char_model_path, yolo_model_path, api_url
-)
+if __name__ == "__main__":
+    # Create the system
+    system = SpeedDetectionSystem(
+        video_path, plate_model_path, char_model_path, yolo_model_path, api_url
+    )
 
+    # vehicle States
 
-# vehicle States
-
-frame_generator = sv.get_video_frames_generator(video_path)
-for frame_idx, frame in enumerate(frame_generator):
-    processed_frame, vehicle_states = system.process_frame(frame)
-    frame = cv2.resize(processed_frame, (1280, 720))
-    cv2.imshow("Frame", frame)
-    if cv2.waitKey(1) & 0xFF == ord("q"):
-        break
-cv2.destroyAllWindows()
+    frame_generator = sv.get_video_frames_generator(video_path)
+    try:
+        for frame_idx, frame in enumerate(frame_generator):
+            processed_frame, vehicle_states = system.process_frame(frame)
+            frame = cv2.resize(processed_frame, (1280, 720))
+            cv2.imshow("Frame", frame)
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                break
+    finally:
+        cv2.destroyAllWindows()
+        # Sends the alerts still held back (waiting for a plate or being merged)
+        system.alert_dispatcher.close()
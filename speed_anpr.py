@@ -1,7 +1,6 @@
 import argparse
 import cv2
 import numpy as np
-from ultralytics import YOLO  # Import YOLO from ultralytics
 import supervision as sv  # Supervision library for tracking, annotations, and detection
 from collections import defaultdict, deque  # For tracking object coordinates
 from utils.ANPRPipelineWithTracking import ANPRPipelineWithTracking
@@ -35,10 +34,6 @@ plate_model_path = "best_l.pt"
 char_model_path = "best_char_200.pt"
 
 
-# Initialize the ANPR pipeline with tracking
-anpr_pipeline = ANPRPipelineWithTracking(plate_model_path, char_model_path)
-number_plate_predictor = NumberPlatePredictor()
-
 # Define a dictionary to store state information for each tracker ID
 vehicle_states = {}
 
@@ -98,6 +93,13 @@ if __name__ == "__main__":
     video_path = r"C:\Users\samar\Desktop\capstone\anpr4.1\anprtest4\capstone_data\Main_Gate_Entry-_New_TIET_Gates_TIET_Gates_20241202092633_20241202094048_280254.mp4"
     args = parse_arguments()  # Parse command-line arguments
 
+    # Heavy imports and model loading only happen when the script runs
+    from ultralytics import YOLO  # Import YOLO from ultralytics
+
+    # Initialize the ANPR pipeline with tracking
+    anpr_pipeline = ANPRPipelineWithTracking(plate_model_path, char_model_path)
+    number_plate_predictor = NumberPlatePredictor()
+
     # Load video information (e.g., resolution, frame rate)
     video_info = sv.VideoInfo.from_video_path(video_path)
 
@@ -1,10 +1,8 @@
-import torch
 import cv2
 import numpy as np
 
-from deep_sort_realtime.deepsort_tracker import DeepSort
-from ultralytics import YOLO
-from torch.cuda import is_available as is_gpu_available
+from utils.ImageSizePolicy import ImageSizePolicy
+from utils.InferenceBackend import default_device, load_model
 
 
 class ANPRPipelineWithTracking:
@@ -14,27 +12,51 @@ class ANPRPipelineWithTracking:
         char_model_path,
         confidence_threshold=0.55,
         self_track=True,
+        batch_characters=False,
+        model_registry=None,
+        backend_options=None,
+        plate_size_policy=None,
+        char_size_policy=None,
     ):
-        # Check if GPU is available
-        device = "cuda" if is_gpu_available() else "cpu"
-        print(f"Using device: {device}")  # Print the device being used
-
-        # Load the YOLO models on the appropriate device (GPU or CPU)
-        self.plate_model = YOLO(plate_model_path).to(
-            device
-        )  # Model for detecting number plates
-        self.char_model = YOLO(char_model_path).to(
-            device
-        )  # Model for detecting characters
+        if model_registry is not None:
+            # Models shared with the other feeds of the process, calls are batched across them
+            self.plate_model = model_registry.get(plate_model_path)
+            self.char_model = model_registry.get(char_model_path)
+        else:
+            # Check if GPU is available
+            device = default_device(plate_model_path)
+            print(f"Using device: {device}")  # Print the device being used
+
+            # Load the YOLO models on the appropriate device (GPU or CPU), exported .onnx
+            # files run on ONNX Runtime with `backend_options` (thread counts, providers)
+            backend_options = backend_options or {}
+            self.plate_model = load_model(
+                plate_model_path, device, **backend_options
+            )  # Model for detecting number plates
+            self.char_model = load_model(
+                char_model_path, default_device(char_model_path), **backend_options
+            )  # Model for detecting characters
         self.confidence_threshold = confidence_threshold
+        # Inference size of each model, 640 (their training size) unless a policy picking
+        # it from the input size is given, e.g. ImageSizePolicy(CHAR_BUCKETS) once
+        # benchmark_image_sizes.py shows the smaller sizes read the plates as well
+        self.plate_size_policy = plate_size_policy or ImageSizePolicy.fixed(640)
+        self.char_size_policy = char_size_policy or ImageSizePolicy.fixed(640)
+        # Run the character model once on all plates of a frame instead of once per plate
+        self.batch_characters = batch_characters
 
         # Initialize the DeepSORT tracker
         if self_track:
+            # Only imported when used, the speed system tracks with ByteTrack
+            from deep_sort_realtime.deepsort_tracker import DeepSort
+
             self.deepsort = DeepSort()
 
     def detect_number_plate(self, image):
         """Detect the number plate using the first YOLO model."""
-        results = self.plate_model(image, verbose=False)
+        results = self.plate_model(
+            image, verbose=False, imgsz=self.plate_size_policy.imgsz_for(image)
+        )
         plates = []
 
         # Process the results to extract bounding boxes
@@ -60,6 +82,75 @@ class ANPRPipelineWithTracking:
 
         return plates
 
+    def detect_number_plate_in_vehicles(
+        self, image, vehicle_boxes, tracker_ids, padding=20
+    ):
+        """
+        Detect number plates only inside the (padded) vehicle boxes using one batched call.
+        Returns the same (vehicle_id, x1, y1, x2, y2) int array as track_numer_plates_vehical_data.
+        """
+        image_h, image_w = image.shape[:2]
+        crops = []
+        crop_info = []  # (tracker_id, crop offset, vehicle box inside the crop)
+
+        for tracker_id, vehicle_box in zip(tracker_ids, vehicle_boxes):
+            vx1, vy1, vx2, vy2 = map(int, vehicle_box)
+            x1, y1 = max(0, vx1 - padding), max(0, vy1 - padding)
+            x2, y2 = min(image_w, vx2 + padding), min(image_h, vy2 + padding)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            crops.append(image[y1:y2, x1:x2])
+            crop_info.append(
+                (tracker_id, (x1, y1), (vx1 - x1, vy1 - y1, vx2 - x1, vy2 - y1))
+            )
+
+        if not crops:
+            return np.empty((0, 5), dtype=int)
+
+        # One call per size bucket, small (distant) vehicles are not upscaled to 640
+        results = [None] * len(crops)
+        for imgsz, indices in self.plate_size_policy.group(crops).items():
+            bucket_results = self.plate_model(
+                [crops[i] for i in indices], verbose=False, imgsz=imgsz
+            )
+            for i, result in zip(indices, bucket_results):
+                results[i] = result
+        tracked_plates = []
+
+        for result, (tracker_id, (offset_x, offset_y), vehicle_box) in zip(
+            results, crop_info
+        ):
+            boxes = result.boxes.xyxy.cpu().numpy()  # Bounding box coordinates
+            confidences = result.boxes.conf.cpu().numpy()  # Confidence scores
+
+            # The padding may catch a neighbour's plate, keep plates centred on this vehicle
+            centers_x = (boxes[:, 0] + boxes[:, 2]) / 2
+            centers_y = (boxes[:, 1] + boxes[:, 3]) / 2
+            valid = (
+                (confidences > self.confidence_threshold)
+                & (vehicle_box[0] <= centers_x)
+                & (centers_x <= vehicle_box[2])
+                & (vehicle_box[1] <= centers_y)
+                & (centers_y <= vehicle_box[3])
+            )
+            if not valid.any():
+                continue
+
+            # One plate per vehicle: the most confident one
+            best = np.flatnonzero(valid)[np.argmax(confidences[valid])]
+            px1, py1, px2, py2 = map(int, boxes[best])
+            tracked_plates.append(
+                (
+                    tracker_id,
+                    px1 + offset_x,
+                    py1 + offset_y,
+                    px2 + offset_x,
+                    py2 + offset_y,
+                )
+            )
+
+        return np.array(tracked_plates, dtype=int).reshape(-1, 5)
+
     def track_number_plates(self, image, plates):
         """Track number plates using DeepSORT."""
         # Convert plates to the required format for DeepSORT ([left, top, width, height], confidence, detection_class)
@@ -105,74 +196,158 @@ class ANPRPipelineWithTracking:
         """
         Detections(xyxy=array([[     779.57,      427.78,      999.77,      587.01]], dtype=float32), mask=None, confidence=array([    0.55693], dtype=float32), class_id=array([          2], dtype=float32), tracker_id=array([1]), data={})
         plates = [(x1, y1, x2, y2, confidence)]
+
+        Returns an int array of shape (N, 5) with rows (vehicle_id, x1, y1, x2, y2),
+        each plate and each vehicle being used at most once.
         """
-        tracked_plates_with_vehicle_id = []
-        # print(vehicle_data)
-        # print(vehicle_data[0])
-        for vehicle in vehicle_data:
-
-            # print(vehicle)
-            vehicle_id = vehicle[4]
-            vehicle_bbox = list(
-                map(int, vehicle[0])
-            )  # Assuming vehicle_data contains bounding boxes as [x1, y1, x2, y2]
-
-            for plate in plates:
-                px1, py1, px2, py2, confidence = plate
-
-                # Check if the plate is inside the vehicle bounding box
-                if (
-                    vehicle_bbox[0] <= px1 <= vehicle_bbox[2]
-                    and vehicle_bbox[1] <= py1 <= vehicle_bbox[3]
-                    and vehicle_bbox[0] <= px2 <= vehicle_bbox[2]
-                    and vehicle_bbox[1] <= py2 <= vehicle_bbox[3]
-                ):
-                    tracked_plates_with_vehicle_id.append(
-                        (vehicle_id, px1, py1, px2, py2)
-                    )
-
-        return tracked_plates_with_vehicle_id
+        if len(plates) == 0 or len(vehicle_data) == 0:
+            return np.empty((0, 5), dtype=int)
+
+        plates = np.asarray(plates, dtype=np.float32)
+        plate_boxes = plates[:, :4]
+        plate_confidences = plates[:, 4]
+        vehicle_boxes = vehicle_data.xyxy.astype(int).astype(np.float32)
+
+        # (plates x vehicles) matrix of plates lying fully inside the vehicle box
+        inside = (
+            (vehicle_boxes[None, :, 0] <= plate_boxes[:, None, 0])
+            & (vehicle_boxes[None, :, 1] <= plate_boxes[:, None, 1])
+            & (plate_boxes[:, None, 2] <= vehicle_boxes[None, :, 2])
+            & (plate_boxes[:, None, 3] <= vehicle_boxes[None, :, 3])
+        )
+        plate_index, vehicle_index = np.nonzero(inside)
+        if len(plate_index) == 0:
+            return np.empty((0, 5), dtype=int)
+
+        # For a contained plate the IoU is plate area / vehicle area, so the tightest
+        # vehicle wins when boxes overlap; plate confidence breaks ties between plates
+        plate_areas = np.prod(plate_boxes[:, 2:] - plate_boxes[:, :2], axis=1)
+        vehicle_areas = np.prod(vehicle_boxes[:, 2:] - vehicle_boxes[:, :2], axis=1)
+        scores = (
+            plate_areas[plate_index]
+            / np.maximum(vehicle_areas[vehicle_index], 1.0)
+            * plate_confidences[plate_index]
+        )
+
+        # Greedy one-to-one assignment over the candidate pairs, best score first
+        plate_used = np.zeros(len(plates), dtype=bool)
+        vehicle_used = np.zeros(len(vehicle_boxes), dtype=bool)
+        matches = []
+        for pair in np.argsort(-scores, kind="stable"):
+            p, v = plate_index[pair], vehicle_index[pair]
+            if plate_used[p] or vehicle_used[v]:
+                continue
+            plate_used[p] = vehicle_used[v] = True
+            matches.append((p, v))
+
+        matched_plates, matched_vehicles = np.array(matches).T
+        return np.column_stack(
+            (
+                vehicle_data.tracker_id[matched_vehicles],
+                plate_boxes[matched_plates].astype(int),
+            )
+        ).astype(int)
 
     def detect_characters(self, plate_image):
         """Detect characters in the number plate using the second YOLO model."""
-        results = self.char_model(plate_image, verbose=False)
+        results = self.char_model(
+            plate_image,
+            verbose=False,
+            imgsz=self.char_size_policy.imgsz_for(plate_image),
+        )
         characters = []
 
         # Process character detection results
         for result in results:
-            boxes = result.boxes.xyxy.cpu().numpy()  # Bounding boxes
-            confidences = result.boxes.conf.cpu().numpy()  # Confidence scores
-            class_ids = result.boxes.cls.cpu().numpy()  # Character class IDs
-            names = result.names  # Character class names
+            characters.extend(self._characters_from_result(result))
 
-            # Sort by x-coordinate first, then by y-coordinate to maintain top-to-bottom and left-to-right order
-            sorted_indices = np.lexsort((boxes[:, 1], boxes[:, 0]))
-            sorted_boxes = boxes[sorted_indices]
-            sorted_texts = class_ids[sorted_indices]
+        return characters
 
-            # Collect detected characters
-            for box, text in zip(sorted_boxes, sorted_texts):
-                char = names[int(text)]
-                characters.append(char)
+    def detect_characters_batch(self, plate_images):
+        """Detect characters on several number plates with a single call of the second YOLO model."""
+        if len(plate_images) == 0:
+            return []
+
+        characters = [None] * len(plate_images)
+        # One forward pass per size bucket
+        for imgsz, indices in self.char_size_policy.group(plate_images).items():
+            plates = [plate_images[i] for i in indices]
+
+            # Letterbox every plate to a common size so the whole stack goes through one forward pass
+            batch_w = max(plate.shape[1] for plate in plates)
+            batch_h = max(plate.shape[0] for plate in plates)
+            batch_size = (-(-batch_w // 32) * 32, -(-batch_h // 32) * 32)
+
+            letterboxed = [self._letterbox(plate, batch_size) for plate in plates]
+            results = self.char_model(
+                [plate for plate, _, _ in letterboxed], verbose=False, imgsz=imgsz
+            )
+            for i, result, (_, scale, pad) in zip(indices, results, letterboxed):
+                characters[i] = self._characters_from_result(result, scale, pad)
 
         return characters
 
-    def get_plate_text(self, image, tracked_plates) -> list:
+    @staticmethod
+    def _letterbox(image, size):
+        """Resize an image into `size` (w, h) keeping its aspect ratio and pad the remaining border."""
+        target_w, target_h = size
+        h, w = image.shape[:2]
+        scale = min(target_w / w, target_h / h)
+        new_w, new_h = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+        pad_x, pad_y = (target_w - new_w) // 2, (target_h - new_h) // 2
+
+        if (new_w, new_h) != (w, h):
+            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+        canvas = np.full((target_h, target_w, 3), 114, dtype=np.uint8)
+        canvas[pad_y : pad_y + new_h, pad_x : pad_x + new_w] = image
+        return canvas, scale, (pad_x, pad_y)
+
+    @staticmethod
+    def _characters_from_result(result, scale=1.0, pad=(0, 0)):
+        """Read the characters of one plate from a character model result, left to right."""
+        boxes = result.boxes.xyxy.cpu().numpy()  # Bounding boxes
+        class_ids = result.boxes.cls.cpu().numpy()  # Character class IDs
+        names = result.names  # Character class names
+
+        # Map the boxes from the letterboxed image back to the plate crop
+        boxes = (boxes - np.array([pad[0], pad[1], pad[0], pad[1]])) / scale
+
+        # Sort by x-coordinate first, then by y-coordinate to maintain top-to-bottom and left-to-right order
+        sorted_indices = np.lexsort((boxes[:, 1], boxes[:, 0]))
+        sorted_texts = class_ids[sorted_indices]
+
+        # Collect detected characters
+        return [names[int(text)] for text in sorted_texts]
+
+    def get_plate_text(self, image, tracked_plates, batched=None) -> list:
         """Get the text detected on the number plate along with the ID."""
-        plate_info = []
+        if batched is None:
+            batched = self.batch_characters
+
+        track_ids = []
+        plate_images = []
         for track_id, x1, y1, x2, y2 in tracked_plates:
-            # Crop the number plate region and process characters
+            # Crop the number plate region
             plate_image = image[y1:y2, x1:x2]
             if plate_image.shape[0] == 0 or plate_image.shape[1] == 0:
                 # print("Invalid plate image dimensions:", plate_image.shape)
                 continue
-            characters = self.detect_characters(plate_image)
-            plate_text = "".join(characters)
+            track_ids.append(track_id)
+            plate_images.append(plate_image)
 
-            # Add the ID and text of the plate to the result
-            plate_info.append((track_id, plate_text))
-
-        return plate_info
+        if batched:
+            characters_per_plate = self.detect_characters_batch(plate_images)
+        else:
+            characters_per_plate = [
+                self.detect_characters(plate_image) for plate_image in plate_images
+            ]
+
+        # Pair the ID of each plate with its text
+        return [
+            (track_id, "".join(characters))
+            for track_id, characters in zip(track_ids, characters_per_plate)
+        ]
 
     def draw_bounding_boxes(self, image, plates):
         """Draw bounding boxes around the detected number plates and their characters."""
@@ -0,0 +1,217 @@
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class AlertDispatcher:
+    def __init__(
+        self,
+        api_url,
+        batch_size=50,
+        flush_interval=1.0,
+        plate_wait=4.0,
+        spill_path="alerts_spill.jsonl",
+        retries=3,
+        backoff_factor=0.5,
+        timeout=5.0,
+        spill_retry_interval=30.0,
+    ):
+        """
+        Sends the alerts of the frame loop from a background thread. `submit` only puts the
+        alert on a queue; the worker merges the alerts of each tracker, POSTs them in
+        batches over a pooled session with retries, and appends them to a local file while
+        the endpoint is down (sent again once it is back).
+
+        Args:
+            api_url (str): Endpoint receiving a JSON list of alerts, None to only log them.
+            batch_size (int): Most alerts per POST.
+            flush_interval (float): Seconds alerts are held, and merged, before being sent.
+            plate_wait (float): Seconds an overspeeding alert without a plate waits for one.
+            spill_path (str): JSON lines file of the alerts that could not be delivered,
+                one per process (e.g. per feed) since the file is claimed when resending.
+            retries (int): Retries of a failed POST, with exponential backoff.
+            backoff_factor (float): Base of the backoff between retries, in seconds.
+            timeout (float): Seconds to wait for the endpoint per request.
+            spill_retry_interval (float): Seconds between attempts to deliver spilled alerts
+                when no new alert comes in.
+        """
+        self.api_url = api_url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.plate_wait = plate_wait
+        self.spill_path = spill_path
+        self.timeout = timeout
+        self.spill_retry_interval = spill_retry_interval
+        self.next_spill_retry = 0.0  # also sends the spill file of a previous run
+
+        self.session = None
+        if api_url is not None:
+            # Only imported when alerts are actually sent
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            self.requests = requests
+            self.session = requests.Session()
+            retry = Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["POST"],
+            )
+            self.session.mount("http://", HTTPAdapter(max_retries=retry))
+            self.session.mount("https://", HTTPAdapter(max_retries=retry))
+
+        self.queue = queue.SimpleQueue()
+        self.pending = {}  # tracker id -> merged alert waiting to be sent
+        self.sent_alerts = 0
+        self.spilled_alerts = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, tracker_id, kind, speed, number_plate=None, timestamp=None):
+        """Queues an alert, never blocks the caller."""
+        self.queue.put(
+            (
+                tracker_id,
+                kind,
+                speed,
+                number_plate,
+                time.time() if timestamp is None else timestamp,
+            )
+        )
+
+    def _merge(self, tracker_id, kind, speed, number_plate, timestamp):
+        alert = self.pending.get(tracker_id)
+        if alert is None:
+            self.pending[tracker_id] = alert = {
+                "tracker_id": int(tracker_id),
+                "types": [],
+                "speed": 0.0,
+                "vehicleNumber": None,
+                "first_seen": timestamp,
+                "timestamp": timestamp,
+            }
+        if kind not in alert["types"]:
+            alert["types"].append(kind)
+        alert["speed"] = max(alert["speed"], float(speed))
+        alert["vehicleNumber"] = number_plate or alert["vehicleNumber"]
+        alert["timestamp"] = timestamp
+
+    def _ready(self, now, flush_all=False):
+        ready = []
+        for tracker_id, alert in list(self.pending.items()):
+            age = now - alert["first_seen"]
+            if not flush_all and age < self.flush_interval:
+                continue
+            # Hold an overspeeding alert back a little for its plate
+            if (
+                not flush_all
+                and alert["vehicleNumber"] is None
+                and age < self.plate_wait
+            ):
+                continue
+            del self.pending[tracker_id]
+            ready.append(self._payload(alert))
+        return ready
+
+    @staticmethod
+    def _payload(alert):
+        return {
+            "tracker_id": alert["tracker_id"],
+            "types": alert["types"],
+            "speed": round(alert["speed"], 1),
+            "vehicleNumber": alert["vehicleNumber"] or "UNKNOWN",
+            "timestamp": datetime.fromtimestamp(
+                alert["timestamp"], timezone.utc
+            ).isoformat(),
+        }
+
+    def _post(self, alerts):
+        if self.api_url is None:
+            for alert in alerts:
+                print(f"Alert: {alert}")
+            return True
+        try:
+            response = self.session.post(
+                self.api_url, json=alerts, timeout=self.timeout
+            )
+        except self.requests.RequestException as e:
+            print(f"Error sending {len(alerts)} alerts: {e}")
+            return False
+        if response.status_code >= 300:
+            print(f"Failed to send {len(alerts)} alerts: {response.text}")
+            return False
+        self.sent_alerts += len(alerts)
+        return True
+
+    def _spill(self, alerts):
+        with open(self.spill_path, "a") as spill_file:
+            for alert in alerts:
+                spill_file.write(json.dumps(alert) + "\n")
+
+    def _resend_spilled(self):
+        if not self.spill_path:
+            return
+        # Claim the file atomically: alerts spilled from now on go to a new file, and
+        # another process sharing the path cannot resend the same alerts
+        claimed_path = f"{self.spill_path}.{os.getpid()}"
+        try:
+            os.replace(self.spill_path, claimed_path)
+        except FileNotFoundError:
+            return
+        with open(claimed_path) as spill_file:
+            alerts = [json.loads(line) for line in spill_file if line.strip()]
+        os.remove(claimed_path)
+        self._send(alerts, resend_spilled=False)
+
+    def _send(self, alerts, resend_spilled=True):
+        for start in range(0, len(alerts), self.batch_size):
+            batch = alerts[start : start + self.batch_size]
+            if not self._post(batch):
+                # Endpoint down: keep the rest on disk for the next successful send
+                if self.spill_path:
+                    self._spill(alerts[start:])
+                    if resend_spilled:
+                        # Alerts coming back from the file are not counted twice
+                        self.spilled_alerts += len(alerts) - start
+                return
+        if resend_spilled:
+            self._resend_spilled()
+
+    def _run(self):
+        while True:
+            stopping = self.stop_event.is_set()
+            try:
+                self._merge(*self.queue.get(timeout=self.flush_interval / 4))
+                # Drain whatever else is queued before looking at the batch
+                while True:
+                    self._merge(*self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            now = time.time()
+            ready = self._ready(now, flush_all=stopping)
+            if ready:
+                self._send(ready)
+            elif now >= self.next_spill_retry:
+                self.next_spill_retry = now + self.spill_retry_interval
+                self._resend_spilled()
+            if stopping:
+                return
+
+    def stats(self):
+        return {
+            "pending_alerts": len(self.pending) + self.queue.qsize(),
+            "sent_alerts": self.sent_alerts,
+            "spilled_alerts": self.spilled_alerts,
+        }
+
+    def close(self):
+        """Sends the alerts still waiting and stops the worker."""
+        self.stop_event.set()
+        self.thread.join(timeout=30.0)
@@ -0,0 +1,160 @@
+import string
+
+import numpy as np
+
+# Substitutions the character model is known to mix up, with their edit cost (1 = unrelated)
+DEFAULT_SUBSTITUTION_COSTS = {
+    ("0", "O"): 0.2,
+    ("0", "D"): 0.3,
+    ("O", "D"): 0.3,
+    ("0", "Q"): 0.4,
+    ("1", "I"): 0.2,
+    ("1", "L"): 0.5,
+    ("1", "7"): 0.5,
+    ("8", "B"): 0.3,
+    ("5", "S"): 0.3,
+    ("2", "Z"): 0.4,
+    ("6", "G"): 0.4,
+    ("4", "A"): 0.6,
+}
+
+ALPHABET = string.digits + string.ascii_uppercase
+
+
+class ConfusionWeightedDistance:
+    def __init__(self, substitution_costs=None, indel_cost=1.0):
+        """
+        Edit distance where substituting characters the OCR often confuses is cheap.
+
+        Args:
+            substitution_costs (dict): {(char1, char2): cost}, applied in both directions.
+            indel_cost (float): Cost of inserting or deleting a character.
+        """
+        if substitution_costs is None:
+            substitution_costs = DEFAULT_SUBSTITUTION_COSTS
+        self.substitution_costs = dict(substitution_costs)
+        self.indel_cost = indel_cost
+
+        # Every character outside the alphabet shares the last code
+        self.codes = {char: code for code, char in enumerate(ALPHABET)}
+        size = len(ALPHABET) + 1
+        self.cost_matrix = np.ones((size, size), dtype=np.float32)
+        np.fill_diagonal(self.cost_matrix, 0.0)
+        self.cost_matrix[-1, -1] = 1.0
+
+        # Characters linked by a cheap substitution share one canonical character
+        parent = {char: char for char in ALPHABET}
+
+        def find(char):
+            while parent[char] != char:
+                char = parent[char]
+            return char
+
+        for (char1, char2), cost in self.substitution_costs.items():
+            code1, code2 = self._code(char1), self._code(char2)
+            self.cost_matrix[code1, code2] = self.cost_matrix[code2, code1] = cost
+            if cost < 1 and char1 in parent and char2 in parent:
+                root1, root2 = sorted((find(char1), find(char2)))
+                parent[root2] = root1
+        self.canonical = str.maketrans({char: find(char) for char in ALPHABET})
+
+    def _code(self, char):
+        return self.codes.get(char, len(ALPHABET))
+
+    def canonicalize(self, text):
+        """
+        Maps every character to the canonical one of its confusion group. The plain edit
+        distance between canonical texts is a lower bound of the weighted distance.
+        """
+        return text.translate(self.canonical)
+
+    def distance(self, text1, text2):
+        """Returns the weighted edit distance between two texts."""
+        return float(self.distances(text1, [text2])[0])
+
+    def distances(self, text, candidates):
+        """
+        Returns the weighted edit distance from the text to every candidate.
+
+        The DP runs one row per character of `text`, vectorized over all candidates and
+        all columns: the insertion chain inside a row is a running minimum, so each row
+        is a handful of NumPy operations whatever the number of candidates.
+        """
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.float32)
+
+        lengths = np.array([len(candidate) for candidate in candidates])
+        width = int(lengths.max())
+        encoded = np.full((len(candidates), width), len(ALPHABET), dtype=np.intp)
+        for row, candidate in enumerate(candidates):
+            encoded[row, : len(candidate)] = [self._code(char) for char in candidate]
+
+        # Column offsets used to turn the insertion chain into a running minimum
+        offsets = np.arange(width + 1, dtype=np.float32) * self.indel_cost
+        previous = np.broadcast_to(offsets, (len(candidates), width + 1))
+
+        for i, char in enumerate(text, 1):
+            substitution = self.cost_matrix[self._code(char)][encoded]
+            current = np.empty_like(previous)
+            current[:, 0] = i * self.indel_cost
+            current[:, 1:] = np.minimum(
+                previous[:, 1:] + self.indel_cost,  # deletion
+                previous[:, :-1] + substitution,  # substitution
+            )
+            # insertion: current[j] = min over k <= j of current[k] + (j - k) * indel_cost
+            current = np.minimum.accumulate(current - offsets, axis=1) + offsets
+            previous = current
+
+        return previous[np.arange(len(candidates)), lengths]
+
+    @classmethod
+    def from_misreads(cls, misreads, min_count=3, min_cost=0.1, indel_cost=1.0):
+        """
+        Learns substitution costs from (read text, true plate) pairs of our own OCR output.
+        The more often a character is read as another one, the cheaper that substitution.
+        """
+        substitutions = {}
+        occurrences = {}
+        for read_text, true_text in misreads:
+            for read_char, true_char in cls._aligned_pairs(read_text, true_text):
+                occurrences[true_char] = occurrences.get(true_char, 0) + 1
+                if read_char != true_char:
+                    pair = (read_char, true_char)
+                    substitutions[pair] = substitutions.get(pair, 0) + 1
+
+        substitution_costs = {}
+        for (read_char, true_char), count in substitutions.items():
+            if count < min_count:
+                continue
+            cost = max(min_cost, 1.0 - count / occurrences[true_char])
+            pair = tuple(sorted((read_char, true_char)))
+            substitution_costs[pair] = min(cost, substitution_costs.get(pair, 1.0))
+
+        return cls(substitution_costs, indel_cost=indel_cost)
+
+    @staticmethod
+    def _aligned_pairs(text1, text2):
+        """Returns the (char1, char2) pairs matched or substituted by a Levenshtein alignment."""
+        rows, cols = len(text1) + 1, len(text2) + 1
+        table = np.zeros((rows, cols), dtype=np.int32)
+        table[:, 0] = np.arange(rows)
+        table[0, :] = np.arange(cols)
+        for i in range(1, rows):
+            for j in range(1, cols):
+                table[i, j] = min(
+                    table[i - 1, j] + 1,
+                    table[i, j - 1] + 1,
+                    table[i - 1, j - 1] + (text1[i - 1] != text2[j - 1]),
+                )
+
+        pairs = []
+        i, j = rows - 1, cols - 1
+        while i > 0 and j > 0:
+            if table[i, j] == table[i - 1, j - 1] + (text1[i - 1] != text2[j - 1]):
+                pairs.append((text1[i - 1], text2[j - 1]))
+                i, j = i - 1, j - 1
+            elif table[i, j] == table[i - 1, j] + 1:
+                i -= 1
+            else:
+                j -= 1
+        return pairs[::-1]
@@ -0,0 +1,110 @@
+import math
+
+import numpy as np
+import supervision as sv
+
+
+class DetectionScheduler:
+    def __init__(
+        self,
+        fps,
+        interval=1,
+        adaptive=False,
+        max_interval=5,
+        max_drift=0.5,
+        smoothing=0.2,
+    ):
+        """
+        Decides on which frames the vehicle detector runs, and moves the tracked boxes
+        forward on the frames in between.
+
+        Args:
+            fps (float): Frame rate of the source, sets the per-frame time budget.
+            interval (int): Run the detector every `interval` frames (1 runs it on every frame).
+            adaptive (bool): Adapt the interval to the detector time and to the vehicle motion.
+            max_interval (int): Upper bound of the adaptive interval.
+            max_drift (float): Largest predicted motion between two detector frames, as a
+                fraction of the box height, before the adaptive interval is shortened.
+            smoothing (float): Weight of the newest detector time in its running average.
+        """
+        self.frame_budget = 1 / fps
+        self.interval = interval
+        self.adaptive = adaptive
+        self.max_interval = max_interval
+        self.max_drift = max_drift
+        self.smoothing = smoothing
+
+        self.detection_time = None  # running average of detector + tracker time
+        self.frames_to_skip = 0  # decision side, may run ahead of the tracking side
+        self.frames_since_detection = 0
+        self.detections = None  # tracked detections of the last detector frame
+        self.velocities = np.empty((0, 4), dtype=np.float32)  # xyxy change per frame
+        self.previous_boxes = {}  # tracker id -> xyxy on the previous detector frame
+
+    def should_detect(self):
+        """
+        Checks if the detector has to run on the next frame. Only counts the frames itself,
+        so an inference stage can call it ahead of the tracking stage.
+        """
+        if (
+            self.frames_to_skip > 0
+            and self.detections is not None
+            and len(self.detections) > 0
+        ):
+            self.frames_to_skip -= 1
+            return False
+        self.frames_to_skip = self.interval - 1
+        return True
+
+    def update(self, detections, detection_time):
+        """Stores the tracked detections of a detector frame and re-plans the interval."""
+        frames = self.frames_since_detection + 1
+        velocities = np.zeros((len(detections), 4), dtype=np.float32)
+        for row, (tracker_id, box) in enumerate(
+            zip(detections.tracker_id, detections.xyxy)
+        ):
+            previous_box = self.previous_boxes.get(tracker_id)
+            if previous_box is not None:
+                velocities[row] = (box - previous_box) / frames
+
+        self.detections = detections
+        self.velocities = velocities
+        self.previous_boxes = dict(zip(detections.tracker_id, detections.xyxy))
+        self.frames_since_detection = 0
+
+        if self.detection_time is None:
+            self.detection_time = detection_time
+        else:
+            self.detection_time += self.smoothing * (
+                detection_time - self.detection_time
+            )
+        if self.adaptive:
+            self.interval = self._plan_interval()
+
+    def _plan_interval(self):
+        # Skip as many frames as the detector needs to keep up with the source
+        interval = max(1, math.ceil(self.detection_time / self.frame_budget))
+
+        # but re-detect before the fastest vehicle drifts too far from its prediction
+        if len(self.detections):
+            heights = np.maximum(
+                self.detections.xyxy[:, 3] - self.detections.xyxy[:, 1], 1.0
+            )
+            drift_per_frame = np.abs(self.velocities).max(axis=1) / heights
+            fastest = float(drift_per_frame.max())
+            if fastest > 0:
+                interval = min(interval, max(1, int(self.max_drift / fastest)))
+        return min(interval, self.max_interval)
+
+    def predict(self):
+        """Returns the tracked detections moved forward with their constant velocity."""
+        if self.detections is None:
+            return sv.Detections.empty()
+        self.frames_since_detection += 1
+        xyxy = self.detections.xyxy + self.velocities * self.frames_since_detection
+        return sv.Detections(
+            xyxy=xyxy.astype(np.float32),
+            confidence=self.detections.confidence,
+            class_id=self.detections.class_id,
+            tracker_id=self.detections.tracker_id,
+        )
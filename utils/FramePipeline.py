@@ -0,0 +1,119 @@
+import queue
+import threading
+
+_END = object()  # marks the end of the frame stream
+
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+
+class FramePipeline:
+    def __init__(self, frames, stages, queue_size=4, drop_oldest=False):
+        """
+        Runs frame processing as a chain of threads connected by bounded queues.
+
+        Args:
+            frames (iterable): Frame source, read by its own decode thread.
+            stages (list[callable]): Functions applied in order, each on its own thread;
+                every stage gets the output of the previous one.
+            queue_size (int): Capacity of every queue between two stages.
+            drop_oldest (bool): When inference falls behind, drop the oldest decoded frame
+                instead of blocking the decoder (for live sources).
+        """
+        self.frames = frames
+        self.stages = stages
+        self.drop_oldest = drop_oldest
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.dropped_frames = 0
+
+    def _put(self, output_queue, item):
+        while not self.stop_event.is_set():
+            try:
+                output_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _put_dropping_oldest(self, output_queue, item):
+        while not self.stop_event.is_set():
+            try:
+                output_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    output_queue.get_nowait()
+                    self.dropped_frames += 1
+                except queue.Empty:
+                    pass
+
+    def _get(self, input_queue):
+        while not self.stop_event.is_set():
+            try:
+                return input_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _decode(self):
+        output_queue = self.queues[0]
+        put = self._put_dropping_oldest if self.drop_oldest else self._put
+        try:
+            for frame in self.frames:
+                if self.stop_event.is_set():
+                    break
+                put(output_queue, frame)
+        except Exception as error:
+            self._put(output_queue, _StageError(error))
+        # The end marker is never dropped
+        self._put(output_queue, _END)
+
+    def _run_stage(self, stage, input_queue, output_queue):
+        while True:
+            item = self._get(input_queue)
+            if item is _END or isinstance(item, _StageError):
+                self._put(output_queue, item)
+                return
+            try:
+                self._put(output_queue, stage(item))
+            except Exception as error:
+                self._put(output_queue, _StageError(error))
+                return
+
+    def start(self):
+        """Starts the decode thread and one thread per stage."""
+        self.threads = [threading.Thread(target=self._decode, daemon=True)]
+        for stage, input_queue, output_queue in zip(
+            self.stages, self.queues[:-1], self.queues[1:]
+        ):
+            self.threads.append(
+                threading.Thread(
+                    target=self._run_stage,
+                    args=(stage, input_queue, output_queue),
+                    daemon=True,
+                )
+            )
+        for thread in self.threads:
+            thread.start()
+
+    def __iter__(self):
+        """Yields the outputs of the last stage in frame order."""
+        if not self.threads:
+            self.start()
+        while True:
+            item = self._get(self.queues[-1])
+            if item is _END:
+                return
+            if isinstance(item, _StageError):
+                self.stop()
+                raise item.error
+            yield item
+
+    def stop(self):
+        """Stops every thread, e.g. when the consumer quits early."""
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
@@ -0,0 +1,56 @@
+from collections import Counter
+
+# (longest side of the input in pixels up to which the bucket applies, imgsz)
+CHAR_BUCKETS = ((80, 160), (160, 224), (320, 320))
+PLATE_BUCKETS = ((320, 320), (480, 480))
+
+
+class ImageSizePolicy:
+    def __init__(self, buckets=(), default=640, stride=32):
+        """
+        Chooses the inference size (`imgsz`) of a model from the size of its input, so a
+        60x20 plate crop is not upscaled to a 640 letterbox. Inputs are grouped into a few
+        fixed buckets, so the backends only ever see a handful of input shapes (ultralytics'
+        letterbox buffers, the ONNX Runtime I/O bindings of every shape stay cached).
+
+        Args:
+            buckets (iterable): (max longest side, imgsz) pairs; an input goes to the first
+                bucket its longest side fits in. Empty for a fixed size.
+            default (int): imgsz of the inputs larger than every bucket.
+            stride (int): The model stride, every imgsz is rounded up to a multiple of it.
+        """
+        self.buckets = sorted(
+            (max_side, self._round(imgsz, stride)) for max_side, imgsz in buckets
+        )
+        self.default = self._round(default, stride)
+        self.usage = Counter()  # imgsz -> inputs sent at that size
+
+    @staticmethod
+    def _round(imgsz, stride):
+        return -(-int(imgsz) // stride) * stride
+
+    @classmethod
+    def fixed(cls, imgsz=640):
+        return cls((), default=imgsz)
+
+    def imgsz_for(self, image):
+        """Returns the imgsz of one image (or of an (h, w) shape)."""
+        shape = image.shape if hasattr(image, "shape") else image
+        longest_side = max(shape[0], shape[1])
+        for max_side, imgsz in self.buckets:
+            if longest_side <= max_side:
+                return imgsz
+        return self.default
+
+    def group(self, images):
+        """Splits images into {imgsz: [indices]}, one model call per bucket."""
+        groups = {}
+        for i, image in enumerate(images):
+            groups.setdefault(self.imgsz_for(image), []).append(i)
+        for imgsz, indices in groups.items():
+            self.usage[imgsz] += len(indices)
+        return groups
+
+    def sizes(self):
+        """Every imgsz this policy can choose, e.g. to warm a model up."""
+        return sorted({imgsz for _, imgsz in self.buckets} | {self.default})
@@ -0,0 +1,266 @@
+import ast
+import threading
+
+import cv2
+import numpy as np
+
+
+def load_model(model_path, device=None, **options):
+    """
+    Loads a detector by its file type: exported .onnx graphs run on ONNX Runtime (OnnxYOLO),
+    everything else (.pt weights, OpenVINO IR folders, ...) through ultralytics. Both are
+    called the same way and return results with the same boxes.
+
+    Args:
+        model_path (str): Weights file or exported model.
+        device (str): "cpu" or "cuda", None for the backend's default.
+        **options: OnnxYOLO options (thread counts, providers, ...), ignored by ultralytics.
+    """
+    model_path = str(model_path)
+    if model_path.endswith(".onnx"):
+        return OnnxYOLO(model_path, device=device, **options)
+
+    # Only needed for this path, an ONNX-only deployment does not import torch
+    from ultralytics import YOLO
+
+    model = YOLO(model_path)
+    if device is not None and model_path.endswith(".pt"):
+        model = model.to(device)
+    return model
+
+
+def default_device(model_path=None):
+    """
+    "cuda" when the backend of the model can use a GPU, else "cpu". Exported .onnx
+    models ask ONNX Runtime, so an ONNX-only deployment never imports torch.
+    """
+    if model_path is not None and str(model_path).endswith(".onnx"):
+        import onnxruntime as ort
+
+        if "CUDAExecutionProvider" in ort.get_available_providers():
+            return "cuda"
+        return "cpu"
+
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class _Tensor(np.ndarray):
+    """Array with the `.cpu()` / `.numpy()` of a torch tensor, so result handling code works unchanged."""
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.view(np.ndarray)
+
+
+class Boxes:
+    def __init__(self, data):
+        # (N, 6) rows of x1, y1, x2, y2, confidence, class id, like ultralytics' Boxes.data
+        self.data = data.astype(np.float32).view(_Tensor)
+
+    @property
+    def xyxy(self):
+        return self.data[:, :4]
+
+    @property
+    def conf(self):
+        return self.data[:, 4]
+
+    @property
+    def cls(self):
+        return self.data[:, 5]
+
+    def __len__(self):
+        return len(self.data)
+
+
+class Results:
+    def __init__(self, boxes, names, orig_shape):
+        self.boxes = Boxes(boxes)
+        self.names = names
+        self.orig_shape = orig_shape
+
+    def __len__(self):
+        return len(self.boxes)
+
+
+class OnnxYOLO:
+    def __init__(
+        self,
+        model_path,
+        device=None,
+        intra_op_threads=None,
+        inter_op_threads=1,
+        providers=None,
+        conf=0.25,
+        iou=0.7,
+        max_det=300,
+    ):
+        """
+        Runs a YOLO detector exported to ONNX (`yolo export format=onnx`) on ONNX Runtime,
+        with letterboxing and NMS done here. Called like an ultralytics model, with the
+        same box format in the results.
+
+        Args:
+            model_path (str): The .onnx file.
+            device (str): "cuda" to prefer the CUDA provider, anything else runs on CPU.
+            intra_op_threads (int): Threads used inside one operator, None for all cores.
+                Lower it when several models or feeds share the machine.
+            inter_op_threads (int): Threads running independent operators in parallel.
+            providers (list): Execution providers, e.g. ["OpenVINOExecutionProvider"];
+                overrides `device`.
+            conf (float): Default confidence threshold.
+            iou (float): Default IoU threshold of the NMS.
+            max_det (int): Most boxes kept per image.
+        """
+        import onnxruntime as ort
+
+        self.ort = ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if intra_op_threads is not None:
+            options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+
+        if providers is None:
+            providers = ["CPUExecutionProvider"]
+            available = ort.get_available_providers()
+            if device == "cuda" and "CUDAExecutionProvider" in available:
+                providers.insert(0, "CUDAExecutionProvider")
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=providers
+        )
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+        # Symbolic dimensions (dynamic export) are strings
+        batch = model_input.shape[0]
+        self.static_batch = batch if isinstance(batch, int) else None
+        input_hw = model_input.shape[2:]
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        if all(isinstance(size, int) for size in input_hw):
+            self.imgsz = tuple(input_hw)
+            self.dynamic_shape = False
+        else:
+            self.imgsz = tuple(ast.literal_eval(metadata.get("imgsz", "[640, 640]")))
+            self.dynamic_shape = True
+
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+
+        # Preallocated input / output buffers and their I/O binding per input shape
+        self.bindings = {}
+        self.lock = threading.Lock()
+
+    def _binding(self, shape):
+        entry = self.bindings.get(shape)
+        if entry is None:
+            blob = np.zeros(shape, dtype=np.float32)
+            # One plain run gives the output shape to preallocate
+            output = self.session.run([self.output_name], {self.input_name: blob})[0]
+            output = np.empty_like(output)
+            binding = self.session.io_binding()
+            binding.bind_cpu_input(self.input_name, blob)
+            binding.bind_ortvalue_output(
+                self.output_name, self.ort.OrtValue.ortvalue_from_numpy(output)
+            )
+            self.bindings[shape] = entry = (blob, binding, output)
+        return entry
+
+    @staticmethod
+    def letterbox(image, size):
+        """Resizes into `size` (h, w) keeping the aspect ratio, centred on grey padding."""
+        height, width = image.shape[:2]
+        gain = min(size[0] / height, size[1] / width)
+        new_w, new_h = int(round(width * gain)), int(round(height * gain))
+        pad_w, pad_h = (size[1] - new_w) / 2, (size[0] - new_h) / 2
+        left, top = int(round(pad_w - 0.1)), int(round(pad_h - 0.1))
+
+        if (new_w, new_h) != (width, height):
+            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        canvas = np.full((size[0], size[1], 3), 114, dtype=np.uint8)
+        canvas[top : top + new_h, left : left + new_w] = image
+        return canvas, gain, (left, top)
+
+    def _infer(self, images, size):
+        batch_size = self.static_batch or len(images)
+        blob, binding, output = self._binding((batch_size, 3, *size))
+        for i, image in enumerate(images):
+            # HWC BGR uint8 -> CHW RGB float in [0, 1], written into the bound buffer
+            blob[i] = image[:, :, ::-1].transpose(2, 0, 1)
+        blob *= 1 / 255.0
+        self.session.run_with_iobinding(binding)
+        return output
+
+    def _postprocess(self, prediction, conf, iou, classes):
+        # (4 + classes, anchors) -> one row per anchor: cx, cy, w, h, class scores
+        prediction = prediction.T
+        scores = prediction[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+
+        keep = confidences > conf
+        if classes is not None:
+            keep &= np.isin(class_ids, classes)
+        boxes = prediction[keep, :4]
+        confidences, class_ids = confidences[keep], class_ids[keep]
+        if len(boxes) == 0:
+            return np.zeros((0, 6), dtype=np.float32)
+
+        # Per-class NMS on top-left xywh boxes
+        xywh = boxes.copy()
+        xywh[:, :2] -= xywh[:, 2:] / 2
+        indices = cv2.dnn.NMSBoxesBatched(
+            xywh.tolist(), confidences.tolist(), class_ids.tolist(), conf, iou
+        )
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)[: self.max_det]
+
+        xyxy = np.concatenate((xywh[:, :2], xywh[:, :2] + xywh[:, 2:]), axis=1)
+        return np.column_stack(
+            (xyxy[indices], confidences[indices], class_ids[indices])
+        ).astype(np.float32)
+
+    def predict(self, source, conf=None, iou=None, classes=None, imgsz=None, **kwargs):
+        """
+        Detects objects on one BGR image or a list of them, returning one Results per image.
+        Other ultralytics arguments (verbose, ...) are accepted and ignored.
+        """
+        images = list(source) if isinstance(source, (list, tuple)) else [source]
+        conf = self.conf if conf is None else conf
+        iou = self.iou if iou is None else iou
+        size = self.imgsz
+        if imgsz is not None and self.dynamic_shape:
+            size = (imgsz, imgsz) if isinstance(imgsz, int) else tuple(imgsz)
+
+        letterboxed = [self.letterbox(image, size) for image in images]
+        batch_size = self.static_batch or len(images)
+        results = []
+        with self.lock:
+            for start in range(0, len(images), batch_size):
+                chunk = letterboxed[start : start + batch_size]
+                output = self._infer([image for image, _, _ in chunk], size)
+                for i, (_, gain, (left, top)) in enumerate(chunk):
+                    detections = self._postprocess(output[i], conf, iou, classes)
+                    results.append((detections, gain, left, top))
+
+        for (detections, gain, left, top), image in zip(results, images):
+            # Back from the letterbox to the original image
+            detections[:, [0, 2]] = (detections[:, [0, 2]] - left) / gain
+            detections[:, [1, 3]] = (detections[:, [1, 3]] - top) / gain
+            height, width = image.shape[:2]
+            detections[:, [0, 2]] = detections[:, [0, 2]].clip(0, width)
+            detections[:, [1, 3]] = detections[:, [1, 3]].clip(0, height)
+        return [
+            Results(detections, self.names, image.shape[:2])
+            for (detections, _, _, _), image in zip(results, images)
+        ]
+
+    __call__ = predict
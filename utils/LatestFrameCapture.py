@@ -0,0 +1,185 @@
+import threading
+import time
+
+import cv2
+
+
+def is_live_source(source):
+    """True for camera indexes and network streams, False for video files."""
+    return isinstance(source, int) or str(source).startswith(
+        ("rtsp://", "rtmp://", "http://", "https://")
+    )
+
+
+def timestamped_video_frames(video_path):
+    """Yields (frame, presentation timestamp in seconds) for every frame of a video file."""
+    capture = cv2.VideoCapture(video_path)
+    frame_interval = 1 / (capture.get(cv2.CAP_PROP_FPS) or 30)
+    timestamp = None
+    try:
+        while True:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            pts = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            # Some containers report no (or non-increasing) timestamps
+            if timestamp is not None and pts <= timestamp:
+                pts = timestamp + frame_interval
+            timestamp = pts
+            yield frame, timestamp
+    finally:
+        capture.release()
+
+
+class LatestFrameCapture:
+    def __init__(
+        self,
+        source,
+        reconnect_delay=0.5,
+        max_reconnect_delay=10.0,
+        max_reconnects=None,
+        read_timeout=5.0,
+        timestamps=False,
+    ):
+        """
+        Reads a live stream (RTSP, camera index) on a background thread and always hands
+        out the newest frame, instead of the seconds-old frames queued up in OpenCV's
+        buffer when the consumer is slower than the camera. A lost stream is reopened
+        with exponential backoff instead of ending the feed. Meant for live sources: a
+        video file would be replayed from the start on every reconnection.
+
+        Args:
+            source: Anything cv2.VideoCapture accepts, e.g. an rtsp:// URL.
+            reconnect_delay (float): Seconds to wait before the first reconnection attempt.
+            max_reconnect_delay (float): Cap of the doubling delay between attempts.
+            max_reconnects (int): Consecutive failed attempts before giving up,
+                None to retry forever.
+            read_timeout (float): Seconds `read()` waits for a new frame before failing.
+            timestamps (bool): Iterate over (frame, capture time) pairs instead of frames.
+        """
+        self.source = source
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_reconnects = max_reconnects
+        self.read_timeout = read_timeout
+        self.timestamps = timestamps
+
+        self.condition = threading.Condition()
+        self.frame = None  # latest-frame slot
+        self.frame_time = 0.0
+        self.frame_seq = 0
+        self.taken_seq = 0
+        self.stopped = False
+        self.ended = False
+
+        # Counters
+        self.frames_read = 0
+        self.frames_dropped = 0  # overwritten before anyone took them
+        self.reconnects = 0
+
+        self.capture = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _open(self):
+        capture = cv2.VideoCapture(self.source)
+        # Keep OpenCV's own queue as short as the backend allows
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not capture.isOpened():
+            capture.release()
+            return None
+        return capture
+
+    def _run(self):
+        failures = 0  # consecutive failed opens or reads
+        delay = self.reconnect_delay
+        try:
+            while not self.stopped:
+                if self.capture is None:
+                    self.capture = self._open()
+                if self.capture is not None:
+                    ret, frame = self.capture.read()
+                else:
+                    ret, frame = False, None
+
+                if not ret:
+                    if self.capture is not None:
+                        self.capture.release()
+                        self.capture = None
+                    failures += 1
+                    if (
+                        self.max_reconnects is not None
+                        and failures > self.max_reconnects
+                    ):
+                        print(f"Giving up on {self.source} after {failures} attempts")
+                        return
+                    print(f"Lost {self.source}, reconnecting in {delay:.1f}s")
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.max_reconnect_delay)
+                    self.reconnects += 1
+                    continue
+
+                failures = 0
+                delay = self.reconnect_delay
+                with self.condition:
+                    if self.frame_seq > self.taken_seq:
+                        self.frames_dropped += 1
+                    self.frame = frame
+                    self.frame_time = time.time()
+                    self.frame_seq += 1
+                    self.frames_read += 1
+                    self.condition.notify_all()
+        finally:
+            if self.capture is not None:
+                self.capture.release()
+            with self.condition:
+                self.ended = True
+                self.condition.notify_all()
+
+    def read(self, timeout=None):
+        """
+        Waits for a frame newer than the last one returned, like cv2.VideoCapture.read:
+        returns (True, frame), or (False, None) when the stream has ended or timed out.
+        """
+        ret, frame, _ = self.read_timestamped(timeout)
+        return ret, frame
+
+    def read_timestamped(self, timeout=None):
+        """Like `read`, also returning the wall-clock time the frame was captured at."""
+        timeout = self.read_timeout if timeout is None else timeout
+        with self.condition:
+            if not self.condition.wait_for(
+                lambda: self.frame_seq > self.taken_seq or self.ended, timeout
+            ):
+                return False, None, None
+            if self.frame_seq == self.taken_seq:
+                return False, None, None
+            self.taken_seq = self.frame_seq
+            return True, self.frame, self.frame_time
+
+    def __iter__(self):
+        """Yields the newest frames until the stream ends, a frame source for SpeedDetectionSystem."""
+        while True:
+            ret, frame, frame_time = self.read_timestamped()
+            if not ret:
+                if self.ended or self.stopped:
+                    return
+                continue  # no frame yet, still reconnecting
+            yield (frame, frame_time) if self.timestamps else frame
+
+    def isOpened(self):
+        return not self.ended
+
+    def stats(self):
+        return {
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "reconnects": self.reconnects,
+        }
+
+    def release(self):
+        """Stops the capture thread and closes the stream."""
+        self.stopped = True
+        self.thread.join(timeout=self.max_reconnect_delay + 1.0)
+
+    close = release
@@ -0,0 +1,144 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from utils.InferenceBackend import default_device, load_model
+
+
+class BatchedPredictor:
+    def __init__(self, model, max_batch=8, max_wait=0.01):
+        """
+        Shares one model between several threads (e.g. one per camera) and merges their
+        concurrent calls into batched forward passes. Callable like an ultralytics YOLO
+        model: `predictor(images, **kwargs)` / `predictor.predict(...)` return one result
+        per image.
+
+        Args:
+            model: The loaded model, only ever called from the batching thread.
+            max_batch (int): Most images sent through the model in one call.
+            max_wait (float): Seconds to wait for more requests before running a batch.
+        """
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.backlog = deque()  # taken from the queue, but left out of the last batch
+        # (image shape, imgsz, batch size) already warmed up, by any of the feeds
+        self.warmed_shapes = set()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def predict(self, source, **kwargs):
+        single = not isinstance(source, (list, tuple))
+        images = [source] if single else list(source)
+        if not images:
+            return []
+
+        future = Future()
+        # Only calls with the same arguments can share a batch
+        self.requests.put((repr(sorted(kwargs.items())), images, kwargs, future))
+        return future.result()
+
+    __call__ = predict
+
+    def _next_request(self, timeout=None):
+        if self.backlog:
+            return self.backlog.popleft()
+        return self.requests.get(timeout=timeout)
+
+    def _collect(self):
+        first = self._next_request()
+        if first is None:
+            return None
+        key, images, _, _ = first
+        batch = [first]
+        size = len(images)
+        deadline = time.monotonic() + self.max_wait
+
+        # Requests with other arguments wait in the backlog for the following batches
+        skipped = []
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not self.backlog:
+                break
+            try:
+                request = self._next_request(timeout=max(remaining, 0))
+            except queue.Empty:
+                break
+            if (
+                request is not None
+                and request[0] == key
+                and size + len(request[1]) <= self.max_batch
+            ):
+                batch.append(request)
+                size += len(request[1])
+            else:
+                skipped.append(request)
+                if request is None:
+                    break
+
+        self.backlog.extendleft(reversed(skipped))
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            kwargs = batch[0][2]
+            images = [
+                image for _, request_images, _, _ in batch for image in request_images
+            ]
+            try:
+                results = self.model(images, **kwargs)
+            except Exception as error:
+                for _, _, _, future in batch:
+                    future.set_exception(error)
+                continue
+
+            start = 0
+            for _, request_images, _, future in batch:
+                future.set_result(results[start : start + len(request_images)])
+                start += len(request_images)
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join(timeout=1.0)
+
+
+class ModelRegistry:
+    def __init__(self, max_batch=8, max_wait=0.01, backend_options=None):
+        """
+        Loads every weight file once and hands out a shared, batching predictor for it,
+        so several SpeedDetectionSystem instances (one per feed) share one set of models.
+        `backend_options` go to `load_model` (ONNX Runtime threads, providers).
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.backend_options = backend_options or {}
+        self.models = {}  # weight path -> BatchedPredictor
+        self.lock = threading.Lock()
+
+    def get(self, model_path):
+        """Returns the shared predictor of a weight file, loading it on first use."""
+        with self.lock:
+            if model_path not in self.models:
+                device = default_device(model_path)
+                print(f"Loading {model_path} on {device}")
+                self.models[model_path] = BatchedPredictor(
+                    load_model(model_path, device, **self.backend_options),
+                    max_batch=self.max_batch,
+                    max_wait=self.max_wait,
+                )
+            return self.models[model_path]
+
+    def close(self):
+        for predictor in self.models.values():
+            predictor.close()
@@ -1,6 +1,10 @@
 import datetime
 import difflib  # To calculate similarity using sequence matching
 
+from utils.ConfusionWeightedDistance import ConfusionWeightedDistance
+from utils.PlateIndex import PlateIndex
+from utils.TrackStore import TrackStore
+
 # define example numberplates or fetch from DB
 number_plate_db = [
     "HR01AR4949",
@@ -41,9 +45,19 @@ number_plate_db = [
 
 
 class NumberPlatePredictor:
-    def __init__(self, existing_plates=None):
-        # Initialize with an empty history and existing valid number plates
-        self.history = {}
+    def __init__(
+        self,
+        existing_plates=None,
+        substitution_costs=None,
+        history_ttl=300.0,
+        max_history=None,
+        on_history_evicted=None,
+    ):
+        # Initialize with an empty history and existing valid number plates,
+        # entries of plate ids not updated for `history_ttl` seconds are dropped
+        self.history = TrackStore(
+            ttl=history_ttl, max_entries=max_history, on_evict=on_history_evicted
+        )
         """ 
         key: number plate id
         value: dict {
@@ -53,6 +67,12 @@ class NumberPlatePredictor:
         }
         """
         self.existing_plates = existing_plates if existing_plates else number_plate_db
+        # Edit distance index so lookups do not scan every existing plate, with cheap
+        # substitutions for characters the OCR confuses (0/O/D, 1/I, 8/B, 5/S, ...)
+        self.plate_index = PlateIndex(
+            self.existing_plates,
+            weighted_distance=ConfusionWeightedDistance(substitution_costs),
+        )
 
     def _calculate_similarity(self, plate1, plate2):
         """Calculates the similarity between two number plates using sequence matching."""
@@ -62,6 +82,7 @@ class NumberPlatePredictor:
         """Adds a valid plates to the list of existing plates."""
         for plate in plates:
             self.existing_plates.append(plate.upper())
+            self.plate_index.add(plate.upper())
 
     # todo:Imporve this function
     def is_plate_text_valid(self, plate_text):
@@ -70,6 +91,10 @@ class NumberPlatePredictor:
 
     def get_similar_plate(self, plate_text):
         """Returns the most similar plate from existing plates."""
+        return self.plate_index.closest(plate_text)
+
+    def get_similar_plate_linear(self, plate_text):
+        """Returns the most similar plate by comparing against every existing plate."""
         highest_similarity = 0.0
         most_similar_plate = None
 
@@ -83,6 +108,8 @@ class NumberPlatePredictor:
 
     def update_history(self, plate_id, plate_text):
         """Updates the history dictionary with a new plate and its most similar existing plate."""
+        self.history.evict_expired()
+        self.history.touch(plate_id)
         if not plate_text:
             return "", 0.0
         plate_text = plate_text.upper()
@@ -0,0 +1,148 @@
+import numpy as np
+
+
+def levenshtein_distance(text1, text2):
+    """Returns the number of single character edits needed to turn one text into the other."""
+    if len(text1) < len(text2):
+        text1, text2 = text2, text1
+    previous_row = list(range(len(text2) + 1))
+    for i, char1 in enumerate(text1, 1):
+        current_row = [i]
+        for j, char2 in enumerate(text2, 1):
+            current_row.append(
+                min(
+                    previous_row[j] + 1,  # deletion
+                    current_row[j - 1] + 1,  # insertion
+                    previous_row[j - 1] + (char1 != char2),  # substitution
+                )
+            )
+        previous_row = current_row
+    return previous_row[-1]
+
+
+class PlateIndex:
+    def __init__(self, plates=None, max_distance=2, weighted_distance=None):
+        """
+        Bigram inverted index over number plates for bounded edit distance lookups.
+
+        Args:
+            plates (list[str]): Plates to index.
+            max_distance (float): Largest edit distance a lookup will search for.
+            weighted_distance (ConfusionWeightedDistance): Scores matches with OCR confusion
+                aware costs instead of the plain Levenshtein distance.
+        """
+        self.max_distance = max_distance
+        self.weighted_distance = weighted_distance
+        self.plates = []  # plate id -> plate
+        self.plate_ids = {}  # plate -> plate id
+        self.postings = {}  # bigram -> list of plate ids
+        self._posting_arrays = {}  # bigram -> np.ndarray cache of the postings
+        for plate in plates or []:
+            self.add(plate)
+
+    def __len__(self):
+        return len(self.plates)
+
+    def __contains__(self, plate):
+        return plate in self.plate_ids
+
+    def _bigrams(self, text):
+        # With weighted distances confusable characters must share bigrams, so index
+        # the canonical text whose plain distance is a lower bound of the weighted one
+        if self.weighted_distance is not None:
+            text = self.weighted_distance.canonicalize(text)
+        # Boundary markers give the first and last characters their own bigrams
+        padded = f"^{text}$"
+        return {padded[i : i + 2] for i in range(len(padded) - 1)}
+
+    def add(self, plate):
+        """Adds a plate to the index without rebuilding it."""
+        if plate in self.plate_ids:
+            return
+        plate_id = len(self.plates)
+        self.plates.append(plate)
+        self.plate_ids[plate] = plate_id
+
+        for bigram in self._bigrams(plate):
+            self.postings.setdefault(bigram, []).append(plate_id)
+            self._posting_arrays.pop(bigram, None)
+
+    def _posting_array(self, bigram):
+        postings = self._posting_arrays.get(bigram)
+        if postings is None:
+            postings = np.array(self.postings.get(bigram, ()), dtype=np.int32)
+            self._posting_arrays[bigram] = postings
+        return postings
+
+    def candidates(self, plate_text, max_distance=None):
+        """
+        Returns the ids of the plates that can be within `max_distance` edits of the text.
+
+        Every edit changes at most two bigrams, so a plate within k edits shares at
+        least len(bigrams) - 2k distinct bigrams with the text (q-gram lemma).
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        bigrams = self._bigrams(plate_text)
+        min_shared = len(bigrams) - 2 * self._edit_bound(max_distance)
+        if min_shared <= 0 or not self.plates:
+            # Too short to filter on, every plate is a candidate
+            return np.arange(len(self.plates))
+
+        postings = [self._posting_array(bigram) for bigram in bigrams]
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.plates))
+        return np.flatnonzero(shared >= min_shared)
+
+    def _edit_bound(self, max_distance):
+        """Largest number of (canonical) edits a match within `max_distance` can have."""
+        if self.weighted_distance is not None:
+            max_distance /= min(1.0, self.weighted_distance.indel_cost)
+        return int(np.ceil(max_distance))
+
+    def search(self, plate_text, max_distance=None):
+        """Returns all (plate, distance) pairs within `max_distance` edits of the text."""
+        if max_distance is None:
+            max_distance = self.max_distance
+        edit_bound = self._edit_bound(max_distance)
+
+        plates = [
+            self.plates[plate_id]
+            for plate_id in self.candidates(plate_text, max_distance)
+            if abs(len(self.plates[plate_id]) - len(plate_text)) <= edit_bound
+        ]
+        if self.weighted_distance is not None:
+            distances = self.weighted_distance.distances(plate_text, plates)
+            return [
+                (plate, float(distance))
+                for plate, distance in zip(plates, distances)
+                if distance <= max_distance
+            ]
+
+        matches = []
+        for plate in plates:
+            distance = levenshtein_distance(plate_text, plate)
+            if distance <= max_distance:
+                matches.append((plate, distance))
+        return matches
+
+    def closest(self, plate_text):
+        """Returns the closest plate and its similarity, or (None, 0.0) when none is in range."""
+        if plate_text in self.plate_ids:
+            return plate_text, 1.0
+
+        matches = self.search(plate_text)
+        if not matches:
+            return None, 0.0
+        plate, distance = min(matches, key=lambda match: (match[1], match[0]))
+        return plate, self.similarity(plate_text, plate, distance)
+
+    def similarity(self, plate1, plate2, distance=None):
+        """Converts an edit distance into a 0..1 similarity score."""
+        if distance is None:
+            distance = (
+                self.weighted_distance.distance(plate1, plate2)
+                if self.weighted_distance is not None
+                else levenshtein_distance(plate1, plate2)
+            )
+        longest = max(len(plate1), len(plate2))
+        return 1.0 - distance / longest if longest else 1.0
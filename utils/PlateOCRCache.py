@@ -0,0 +1,74 @@
+class PlateOCRCache:
+    def __init__(
+        self,
+        confidence_threshold=0.95,
+        reread_interval=30,
+        growth_ratio=1.5,
+        max_missing_frames=30,
+    ):
+        """
+        Keeps track of which tracked vehicles already have a settled number plate so the
+        plate detector and the character model can skip them.
+
+        Args:
+            confidence_threshold (float): Plate confidence above which a track counts as resolved.
+            reread_interval (int): Frames after which a resolved track is read again (0 disables it).
+            growth_ratio (float): Bounding box area growth since the last read that forces a re-read.
+            max_missing_frames (int): Frames a track may be missing before its entry is dropped.
+        """
+        self.confidence_threshold = confidence_threshold
+        self.reread_interval = reread_interval
+        self.growth_ratio = growth_ratio
+        self.max_missing_frames = max_missing_frames
+
+        self.entries = {}
+        """
+        key: tracker id
+        value: dict {
+            last_read_frame: int
+            bbox_area: float
+            last_seen_frame: int
+        }
+        """
+
+    @staticmethod
+    def _area(bbox):
+        x1, y1, x2, y2 = bbox
+        return max(0.0, float(x2 - x1)) * max(0.0, float(y2 - y1))
+
+    def needs_read(self, tracker_id, bbox, confidence, frame_index):
+        """Checks if the plate of the given track has to be detected and read on this frame."""
+        entry = self.entries.get(tracker_id)
+        if entry is None:
+            self.entries[tracker_id] = entry = {
+                "last_read_frame": None,
+                "bbox_area": 0.0,
+                "last_seen_frame": frame_index,
+            }
+        entry["last_seen_frame"] = frame_index
+
+        if entry["last_read_frame"] is None or confidence <= self.confidence_threshold:
+            return True
+
+        # Resolved track: only read again on schedule or once the vehicle got much closer
+        if (
+            self.reread_interval
+            and frame_index - entry["last_read_frame"] >= self.reread_interval
+        ):
+            return True
+        return self._area(bbox) >= entry["bbox_area"] * self.growth_ratio
+
+    def mark_read(self, tracker_id, bbox, frame_index):
+        """Records that the plate of the given track was read on this frame."""
+        entry = self.entries.setdefault(tracker_id, {"last_seen_frame": frame_index})
+        entry["last_read_frame"] = frame_index
+        entry["bbox_area"] = self._area(bbox)
+
+    def prune(self, frame_index):
+        """Drops the entries of tracks that the tracker has not reported for a while."""
+        for tracker_id in [
+            tracker_id
+            for tracker_id, entry in self.entries.items()
+            if frame_index - entry["last_seen_frame"] > self.max_missing_frames
+        ]:
+            del self.entries[tracker_id]
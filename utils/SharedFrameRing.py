@@ -0,0 +1,221 @@
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from utils.LatestFrameCapture import (
+    LatestFrameCapture,
+    is_live_source,
+    timestamped_video_frames,
+)
+
+# Control words at the start of the shared block
+_WRITE_SEQ = 0  # sequence number of the newest complete frame (0 = none yet)
+_LATEST_SLOT = 1  # slot holding that frame
+_READING_SLOT = 2  # slot held by the reader (-1 = none), never overwritten
+_CLOSED = 3  # set by the writer once the source has ended
+_CONTROL_WORDS = 4
+
+_WRITING = -1  # slot sequence number while a frame is being copied in
+
+# The capture process is started from a process already running threads (inference,
+# batching, alerts), which a fork could deadlock in; spawn starts it afresh
+_CONTEXT = mp.get_context("spawn")
+
+
+class SharedFrameRing:
+    def __init__(
+        self, shape, slots=4, dtype=np.uint8, name=None, lock=None, create=True
+    ):
+        """
+        Ring of preallocated frame slots in shared memory, written by a capture process
+        and read by one inference process without pickling or copying the frames.
+
+        The writer always moves on to the next slot, overwriting the oldest frame when the
+        reader falls behind; the reader always gets the newest frame and can tell how many
+        it missed from the sequence numbers. The slot the reader holds is skipped by the
+        writer, so a frame view stays valid until the next read or `release()`.
+
+        Args:
+            shape (tuple): Shape of every frame, e.g. (2160, 3840, 3).
+            slots (int): Number of frame slots, at least 3.
+            dtype: Pixel type of the frames.
+            name (str): Name of the shared memory block, generated when creating.
+            lock: Guards the slot hand-over between writer and reader, passed to the
+                other process together with the ring.
+            create (bool): Allocate the block, False to attach to an existing one.
+        """
+        if slots < 3:
+            raise ValueError("SharedFrameRing needs at least 3 slots")
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+        self.lock = lock or _CONTEXT.Lock()
+        self.owner = create
+
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        header_bytes = 8 * (_CONTROL_WORDS + 2 * slots)
+        self.memory = shared_memory.SharedMemory(
+            name=name, create=create, size=header_bytes + slots * frame_bytes
+        )
+
+        buffer = self.memory.buf
+        self.control = np.ndarray((_CONTROL_WORDS,), np.int64, buffer)
+        self.slot_seq = np.ndarray(
+            (slots,), np.int64, buffer, offset=8 * _CONTROL_WORDS
+        )
+        self.slot_time = np.ndarray(
+            (slots,), np.float64, buffer, offset=8 * (_CONTROL_WORDS + slots)
+        )
+        self.frames = np.ndarray(
+            (slots, *self.shape), self.dtype, buffer, offset=header_bytes
+        )
+
+        if create:
+            self.control[:] = (0, -1, -1, 0)
+            self.slot_seq[:] = 0
+
+        self.next_slot = 0  # writer side
+        self.last_seq = 0  # reader side
+        self.dropped_frames = 0
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def __getstate__(self):
+        # Sent to the other process by name, it attaches to the same block
+        return {
+            "shape": self.shape,
+            "slots": self.slots,
+            "dtype": self.dtype.str,
+            "name": self.name,
+            "lock": self.lock,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(create=False, **state)
+
+    def write(self, frame, timestamp=None):
+        """Copies a frame into the next free slot and returns its sequence number."""
+        with self.lock:
+            slot = self.next_slot
+            if slot == self.control[_READING_SLOT]:
+                slot = (slot + 1) % self.slots
+            self.slot_seq[slot] = _WRITING
+            seq = int(self.control[_WRITE_SEQ]) + 1
+
+        # The copy itself runs outside the lock, the reader never picks a slot being written
+        self.frames[slot] = frame
+        self.slot_time[slot] = time.time() if timestamp is None else timestamp
+
+        with self.lock:
+            self.slot_seq[slot] = seq
+            self.control[_LATEST_SLOT] = slot
+            self.control[_WRITE_SEQ] = seq
+        self.next_slot = (slot + 1) % self.slots
+        return seq
+
+    def read(self, timeout=None, poll_interval=0.001):
+        """
+        Waits for a frame newer than the last one read and returns (seq, timestamp, view),
+        or None once the writer has closed the ring (or on timeout). The view points into
+        shared memory and stays valid until the next read.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                seq = int(self.control[_WRITE_SEQ])
+                if seq > self.last_seq:
+                    slot = int(self.control[_LATEST_SLOT])
+                    self.control[_READING_SLOT] = slot
+                    break
+                closed = self.control[_CLOSED]
+            if closed or (deadline is not None and time.monotonic() >= deadline):
+                return None
+            time.sleep(poll_interval)
+
+        if self.last_seq:
+            self.dropped_frames += seq - self.last_seq - 1
+        self.last_seq = seq
+        return seq, float(self.slot_time[slot]), self.frames[slot]
+
+    def release(self):
+        """Lets the writer reuse the slot of the last frame read."""
+        with self.lock:
+            self.control[_READING_SLOT] = -1
+
+    def iter_frames(self, copy=False, timestamps=False):
+        """
+        Yields the newest frames until the writer closes the ring, a frame source for
+        SpeedDetectionSystem. Each view is only valid until the next one is taken, use
+        `copy=True` when frames are queued (e.g. by FramePipeline). With `timestamps`,
+        yields (frame, capture time) pairs.
+        """
+        while True:
+            item = self.read()
+            if item is None:
+                return
+            _, timestamp, frame = item
+            if copy:
+                frame = frame.copy()
+            yield (frame, timestamp) if timestamps else frame
+
+    def close(self):
+        """Marks the end of the stream (writer side)."""
+        self.control[_CLOSED] = 1
+
+    def unlink(self):
+        """Frees the shared memory block, called by the creating process."""
+        # Views into the block must be gone before it can be closed
+        del self.control, self.slot_seq, self.slot_time, self.frames
+        try:
+            self.memory.close()
+        except BufferError:
+            pass  # a frame view is still referenced, the mapping goes with it
+        if self.owner:
+            self.memory.unlink()
+
+
+def capture_to_ring(source, ring):
+    """
+    Capture process: decodes `source` into the ring until it ends. Live streams are
+    read through a LatestFrameCapture (newest frame, reconnection) and stamped with their
+    capture time, files with their presentation timestamps since they decode faster
+    than real time. Frames of another size than the ring's are resized to fit.
+    """
+    live = is_live_source(source)
+    capture = LatestFrameCapture(source) if live else None
+    frames = None if live else timestamped_video_frames(source)
+    height, width = ring.shape[:2]
+    try:
+        while True:
+            if live:
+                ret, frame, timestamp = capture.read_timestamped()
+                if not ret:
+                    if capture.isOpened():
+                        continue  # still reconnecting
+                    break
+            else:
+                frame, timestamp = next(frames, (None, None))
+                if frame is None:
+                    break
+            if frame.shape[:2] != (height, width):
+                frame = cv2.resize(frame, (width, height))
+            ring.write(frame, timestamp)
+    finally:
+        if live:
+            capture.release()
+        else:
+            frames.close()
+        ring.close()
+
+
+def start_capture_process(source, shape, slots=4):
+    """Starts `capture_to_ring` in its own process and returns (process, ring)."""
+    ring = SharedFrameRing(shape, slots=slots)
+    process = _CONTEXT.Process(target=capture_to_ring, args=(source, ring), daemon=True)
+    process.start()
+    return process, ring
@@ -1,12 +1,22 @@
 import time as t
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import supervision as sv
-from collections import defaultdict, deque
+import math
+from utils.AlertDispatcher import AlertDispatcher
 from utils.ANPRPipelineWithTracking import ANPRPipelineWithTracking
+from utils.DetectionScheduler import DetectionScheduler
+from utils.FramePipeline import FramePipeline
+from utils.InferenceBackend import OnnxYOLO, load_model
+from utils.LatestFrameCapture import (
+    LatestFrameCapture,
+    is_live_source,
+    timestamped_video_frames,
+)
 from utils.NumberPlatePredictor import NumberPlatePredictor
-import requests
+from utils.PlateOCRCache import PlateOCRCache
+from utils.TrackStore import TrackStore
+from utils.TrackTable import TrackTable
 
 
 class SpeedDetectionSystem:
@@ -18,46 +28,113 @@ class SpeedDetectionSystem:
         yolo_model_path,
         api_url,
         mask=True,
+        plate_reread_interval=30,
+        plate_reread_growth=1.5,
+        plate_on_vehicle_crops=True,
+        track_ttl=60.0,
+        max_tracks=None,
+        on_track_evicted=None,
+        detect_interval=1,
+        adaptive_detect_interval=False,
+        max_detect_interval=5,
+        model_registry=None,
+        alert_dispatcher=None,
+        backend_options=None,
+        vehicle_imgsz=640,
+        plate_size_policy=None,
+        char_size_policy=None,
+        warmup=True,
+        warmup_max_batch=1,
     ):
+        load_start = t.perf_counter()
         self.video_path = video_path
         self.plate_model_path = plate_model_path
         self.char_model_path = char_model_path
         self.yolo_model_path = yolo_model_path
         self.api_url = api_url
+        # Run the plate model on the vehicle crops instead of the whole frame
+        self.plate_on_vehicle_crops = plate_on_vehicle_crops
 
         self.anpr_pipeline = ANPRPipelineWithTracking(
-            plate_model_path, char_model_path, self_track=False
+            plate_model_path,
+            char_model_path,
+            self_track=False,
+            batch_characters=True,
+            model_registry=model_registry,
+            backend_options=backend_options,
+            plate_size_policy=plate_size_policy,
+            char_size_policy=char_size_policy,
         )
         self.number_plate_predictor = NumberPlatePredictor()
+        # Inference size of the vehicle detector on the (mask-cropped) frame
+        self.vehicle_imgsz = vehicle_imgsz
+        self.frame_index = 0
 
-        self.vehicle_states = {}
-        self.coordinates = defaultdict(lambda: deque(maxlen=30))
+        # Skip plate detection and OCR for tracks whose plate is already settled
+        self.plate_ocr_cache = PlateOCRCache(
+            reread_interval=plate_reread_interval, growth_ratio=plate_reread_growth
+        )
+
+        # Per-track state is dropped once a track has not been seen for `track_ttl` seconds,
+        # `on_track_evicted(tracker_id, vehicle_state)` gets it first (e.g. for export)
+        self.on_track_evicted = on_track_evicted
+        self.vehicle_states = TrackStore(
+            ttl=track_ttl, max_entries=max_tracks, on_evict=self._evict_track
+        )
 
-        # Initialize YOLO model
-        self.model = YOLO(yolo_model_path)
+        # Initialize YOLO model, or take the one shared by every feed of a ModelRegistry
+        if model_registry is not None:
+            self.model = model_registry.get(yolo_model_path)
+        else:
+            self.model = load_model(yolo_model_path, **(backend_options or {}))
+        self.load_time = t.perf_counter() - load_start
 
         # Load video info
         self.video_info = sv.VideoInfo.from_video_path(video_path)
 
-        # Initialize ByteTrack for tracking
+        # Initialize ByteTrack for tracking. It is only updated on detector frames and
+        # counts its lost-track buffer and activation in updates, so it runs at the
+        # detector's rate: with every-N-frames detection, tracks are kept as long (in
+        # seconds) and activate as fast (in frames, ~3) as when detecting every frame.
+        # The adaptive interval changes at runtime, so ByteTrack is built for the
+        # starting one there and its lost-track time stretches with the interval.
         self.byte_track = sv.ByteTrack(
-            frame_rate=self.video_info.fps,
+            frame_rate=max(1, round(self.video_info.fps / detect_interval)),
             track_activation_threshold=0.35,
             minimum_matching_threshold=0.8,
-            minimum_consecutive_frames=3,
+            minimum_consecutive_frames=math.ceil(3 / detect_interval),
         )
 
-        # Define polygon mask
-        self.polygon_mask = np.zeros(
-            (self.video_info.resolution_wh[1], self.video_info.resolution_wh[0]),
-            dtype=np.uint8,
+        # Recent positions and speed summary of every track, speeds computed for all
+        # tracks of a frame at once
+        self.track_table = TrackTable(
+            history=30, min_samples=math.ceil(self.video_info.fps / 2)
+        )
+
+        # Run the vehicle detector every N frames, moving the tracks forward in between
+        self.detection_scheduler = DetectionScheduler(
+            self.video_info.fps,
+            interval=detect_interval,
+            adaptive=adaptive_detect_interval,
+            max_interval=max_detect_interval,
         )
+
+        # Define polygon mask
         self.SOURCE = np.array([[576, 555], [1054, 512], [3080, 1155], [1017, 1493]])
         self.TARGET = np.array(
             [[0, 0], [2, 0], [2, 38], [0, 38]]
         )  # Adjust as per calibration
         self.MASK = np.array([(567, 520), (1224, 1921), (3080, 1155), (1300, 200)])
-        cv2.fillPoly(self.polygon_mask, [self.MASK], 255)
+
+        # Inference only runs on the bounding rectangle of the mask (x1, y1, x2, y2)
+        frame_w, frame_h = self.video_info.resolution_wh
+        roi_x, roi_y, roi_w, roi_h = cv2.boundingRect(self.MASK.astype(np.int32))
+        self.roi = (
+            max(0, roi_x),
+            max(0, roi_y),
+            min(frame_w, roi_x + roi_w),
+            min(frame_h, roi_y + roi_h),
+        )
         self.mask = mask
         # Perspective transformation
         self.view_transformer = ViewTransformer(self.SOURCE, self.TARGET)
@@ -83,12 +160,20 @@ class SpeedDetectionSystem:
             color_lookup=sv.ColorLookup.TRACK,
         )
 
-        # Request scheduler
-        self.request_schuler = set()
+        # Alerts are sent from a background thread, possibly shared with other feeds
+        self.alert_dispatcher = alert_dispatcher or AlertDispatcher(api_url)
+
+        # Allocate the models' buffers before the first real frame instead of on it
+        self.warmup_time = self.warmup(max_batch=warmup_max_batch) if warmup else 0.0
+        print(
+            f"Models loaded in {self.load_time:.2f}s, warmed up in {self.warmup_time:.2f}s"
+        )
 
     class VehicleState:
         def __init__(self):
-            self.speeds = []
+            # Copied from the track table's summary, kept after the track is evicted
+            self.speed = 0  # smoothed (EMA) speed, shown in the label
+            self.alert_speed = 0  # percentile of the recent speeds, alerts compare it
             self.number_plate = None
             self.max_speed = 0
             self.image = None
@@ -97,14 +182,59 @@ class SpeedDetectionSystem:
             self.last_request_time_overspeeding = 0
             self.last_update = 0
 
-    def process_frame(self, frame):
+    def warmup(self, runs=2, max_batch=1):
+        """
+        Runs blank images through every model at each input shape it is configured for:
+        the vehicle detector on the frame or mask rectangle, the plate and character
+        models at every size of their policies. Batch sizes up to `max_batch` (the vehicle
+        crops and plates of one frame go through as one batch) are only warmed on ONNX
+        models with a dynamic batch, which preallocate per batch size; ultralytics models
+        get batch 1 only. Models shared through a ModelRegistry are only warmed once per
+        shape for all feeds. Returns the time it took in seconds.
+        """
+        start = t.perf_counter()
         if self.mask:
-            masked_frame = cv2.bitwise_and(frame, frame, mask=self.polygon_mask)
+            x1, y1, x2, y2 = self.roi
         else:
-            masked_frame = frame.copy()
-
+            x1, y1 = 0, 0
+            x2, y2 = self.video_info.resolution_wh
+
+        self._warm(self.model, (y2 - y1, x2 - x1, 3), self.vehicle_imgsz, [1], runs)
+        for model, policy in (
+            (self.anpr_pipeline.plate_model, self.anpr_pipeline.plate_size_policy),
+            (self.anpr_pipeline.char_model, self.anpr_pipeline.char_size_policy),
+        ):
+            for imgsz in policy.sizes():
+                self._warm(
+                    model, (imgsz, imgsz, 3), imgsz, range(1, max_batch + 1), runs
+                )
+        return t.perf_counter() - start
+
+    @staticmethod
+    def _warm(model, image_shape, imgsz, batch_sizes, runs):
+        # Only ONNX models with a dynamic batch keep a binding per batch size
+        backend = getattr(model, "model", model)  # behind a registry's BatchedPredictor
+        if not (isinstance(backend, OnnxYOLO) and backend.static_batch is None):
+            batch_sizes = [1]
+        # Registry predictors remember what any feed already warmed them with
+        warmed_shapes = getattr(model, "warmed_shapes", set())
+        image = np.full(image_shape, 114, dtype=np.uint8)
+        for batch_size in batch_sizes:
+            key = (image_shape, imgsz, batch_size)
+            if key in warmed_shapes:
+                continue
+            for _ in range(runs):
+                model([image] * batch_size, verbose=False, imgsz=imgsz)
+            warmed_shapes.add(key)
+
+    def _detect_vehicles(self, frame):
+        """Runs the vehicle detector and returns its (untracked) detections."""
         results = self.model.predict(
-            masked_frame, classes=[2, 3, 5, 7, 67], verbose=False, conf=0.25
+            frame,
+            classes=[2, 3, 5, 7, 67],
+            verbose=False,
+            conf=0.25,
+            imgsz=self.vehicle_imgsz,
         )
         detections = results[0].boxes
 
@@ -112,25 +242,106 @@ class SpeedDetectionSystem:
         confidence = detections.conf.cpu().numpy()
         class_id = detections.cls.cpu().numpy()
 
-        detections_sv = sv.Detections(
-            xyxy=xywh, confidence=confidence, class_id=class_id
-        )
-        detections_sv = self.byte_track.update_with_detections(detections=detections_sv)
+        return sv.Detections(xyxy=xywh, confidence=confidence, class_id=class_id)
+
+    def _detect_number_plates(self, frame):
+        """Runs the plate detector on the whole frame, or on the mask's rectangle."""
+        if not self.mask:
+            return self.anpr_pipeline.detect_number_plate(frame)
+        x1, y1, x2, y2 = self.roi
+        return [
+            (px1 + x1, py1 + y1, px2 + x1, py2 + y1, confidence)
+            for px1, py1, px2, py2, confidence in self.anpr_pipeline.detect_number_plate(
+                frame[y1:y2, x1:x2]
+            )
+        ]
+
+    def detect(self, frame):
+        """
+        Inference stage: runs the vehicle detector if the scheduler wants it on this frame.
+        Returns (detections or None on tracker-only frames, detector time in seconds).
+        """
+        if not self.detection_scheduler.should_detect():
+            return None, 0.0
+
+        start = t.perf_counter()
+        if self.mask:
+            # Detect on the mask's bounding rectangle only, then keep the vehicles
+            # standing inside the polygon
+            x1, y1, x2, y2 = self.roi
+            detections_sv = self._detect_vehicles(frame[y1:y2, x1:x2])
+            detections_sv.xyxy += np.array([x1, y1, x1, y1], dtype=np.float32)
+            anchors = detections_sv.get_anchors_coordinates(
+                anchor=sv.Position.BOTTOM_CENTER
+            )
+            detections_sv = detections_sv[points_in_polygon(anchors, self.MASK)]
+        else:
+            detections_sv = self._detect_vehicles(frame)
+        return detections_sv, t.perf_counter() - start
+
+    def track(self, frame, detections, detection_time=0.0, timestamp=None):
+        """
+        Tracking stage: updates the tracks, their plates and speeds.
+        Returns the tracked detections and their labels.
+
+        `timestamp` is when the frame was shot, in seconds (presentation timestamp of a
+        file, capture time of a live stream); speeds are fitted against it, so dropped and
+        skipped frames do not distort them. Without it, frames are assumed evenly spaced
+        at the nominal frame rate.
+        """
+        detected = detections is not None
+        if detected:
+            start = t.perf_counter()
+            detections_sv = self.byte_track.update_with_detections(
+                detections=detections
+            )
+            self.detection_scheduler.update(
+                detections_sv, detection_time + t.perf_counter() - start
+            )
+        else:
+            # Tracker-only frame: move the tracks forward, speed still gets a point
+            detections_sv = self.detection_scheduler.predict()
 
         points = detections_sv.get_anchors_coordinates(anchor=sv.Position.BOTTOM_CENTER)
         points = self.view_transformer.transform_points(points)
 
+        self.frame_index += 1
+        if timestamp is None:
+            timestamp = self.frame_index / self.video_info.fps
         final_plate_list = []
         labels = []  # Annotations to display
         if points is not None:
-            plates = self.anpr_pipeline.detect_number_plate(masked_frame)
-            if plates:
+            # Only tracks without a settled plate (or due for a re-read) go through ANPR,
+            # and only on detector frames where the boxes are not extrapolated
+            tracks_to_read = {
+                tracker_id: bbox
+                for tracker_id, bbox in zip(
+                    detections_sv.tracker_id, detections_sv.xyxy
+                )
+                if detected
+                and self.plate_ocr_cache.needs_read(
+                    tracker_id,
+                    bbox,
+                    self._plate_confidence(tracker_id),
+                    self.frame_index,
+                )
+            }
+            if not tracks_to_read:
+                tracked_plates = []
+            elif self.plate_on_vehicle_crops:
+                tracked_plates = self.anpr_pipeline.detect_number_plate_in_vehicles(
+                    frame, tracks_to_read.values(), tracks_to_read.keys()
+                )
+            else:
+                plates = self._detect_number_plates(frame)
                 tracked_plates = self.anpr_pipeline.track_numer_plates_vehical_data(
                     detections_sv, plates
                 )
-                number_plates = self.anpr_pipeline.get_plate_text(
-                    masked_frame, tracked_plates
-                )
+                tracked_plates = tracked_plates[
+                    np.isin(tracked_plates[:, 0], list(tracks_to_read))
+                ]
+            if len(tracked_plates):
+                number_plates = self.anpr_pipeline.get_plate_text(frame, tracked_plates)
                 for number_plate in number_plates:
                     number_plate_text, confidence = (
                         self.number_plate_predictor.update_history(
@@ -140,28 +351,39 @@ class SpeedDetectionSystem:
                     final_plate_list.append(
                         (number_plate[0], number_plate_text, confidence)
                     )
+            for tracker_id, bbox in tracks_to_read.items():
+                self.plate_ocr_cache.mark_read(tracker_id, bbox, self.frame_index)
+
+            # Speeds of every track in one pass (m/s to km/h), NaN until a track
+            # has enough samples
+            speeds = (
+                self.track_table.update(
+                    detections_sv.tracker_id, points[:, 1], timestamp
+                )
+                * 3.6
+            )
 
-            for tracker_id, [_, y], (x1, y1, x2, y2) in zip(
-                detections_sv.tracker_id, points, detections_sv.xyxy
+            # Speed summary of every track, the alert threshold is checked against the
+            # percentile so that one noisy estimate does not raise an alert
+            max_speeds, ema_speeds, alert_speeds = (
+                summary * 3.6
+                for summary in self.track_table.summaries(detections_sv.tracker_id)
+            )
+
+            for tracker_id, speed, max_speed, ema_speed, alert_speed in zip(
+                detections_sv.tracker_id, speeds, max_speeds, ema_speeds, alert_speeds
             ):
                 if tracker_id not in self.vehicle_states:
                     self.vehicle_states[tracker_id] = self.VehicleState()
 
                 current_vehicle_state = self.vehicle_states[tracker_id]
-                self.coordinates[tracker_id].append(y)
                 current_vehicle_state.last_update = t.time()
-                if len(self.coordinates[tracker_id]) >= self.video_info.fps / 2:
-                    coordinates_start = self.coordinates[tracker_id][-1]
-                    coordinates_end = self.coordinates[tracker_id][0]
-                    distance = abs(coordinates_start - coordinates_end)
-                    time = len(self.coordinates[tracker_id]) / self.video_info.fps
-                    speed = distance / time * 3.6
-                    if speed > 50:
-                        speed *0.2
-                    current_vehicle_state.speeds.append(speed)
-                    current_vehicle_state.max_speed = max(
-                        current_vehicle_state.max_speed, speed
-                    )
+                self.vehicle_states.touch(tracker_id, current_vehicle_state.last_update)
+                if not np.isnan(speed):
+                    speed = float(alert_speed)
+                    current_vehicle_state.speed = float(ema_speed)
+                    current_vehicle_state.alert_speed = speed
+                    current_vehicle_state.max_speed = float(max_speed)
 
                     if speed > 30:  # Example threshold
                         self.send_alert(
@@ -182,12 +404,20 @@ class SpeedDetectionSystem:
                                 self.send_alert(tracker_id, speed, plate_text)
 
                 # Create labels for the annotations
-                label = f"# {tracker_id} | Speed: {int(current_vehicle_state.max_speed)} km/h"
+                label = (
+                    f"# {tracker_id} | Speed: {int(current_vehicle_state.speed)} km/h"
+                )
                 if current_vehicle_state.number_plate:
                     label += f" | Plate: {current_vehicle_state.number_plate}"
                 labels.append(label)
 
-        # Annotate frame
+        self.plate_ocr_cache.prune(self.frame_index)
+        self.vehicle_states.evict_expired()
+
+        return detections_sv, labels
+
+    def annotate(self, frame, detections_sv, labels):
+        """Annotation stage: draws the traces, boxes and labels on a copy of the frame."""
         annotated_frame = frame.copy()
         annotated_frame = self.trace_annotator.annotate(
             scene=annotated_frame, detections=detections_sv
@@ -198,94 +428,132 @@ class SpeedDetectionSystem:
         annotated_frame = self.label_annotator.annotate(
             scene=annotated_frame, detections=detections_sv, labels=labels
         )
-        return annotated_frame, self.vehicle_states
+        return annotated_frame
+
+    def process_frame(self, frame, timestamp=None):
+        detections, detection_time = self.detect(frame)
+        detections_sv, labels = self.track(frame, detections, detection_time, timestamp)
+        return self.annotate(frame, detections_sv, labels), self.vehicle_states
+
+    def _evict_track(self, tracker_id, vehicle_state):
+        self.track_table.remove(tracker_id)
+        if self.on_track_evicted is not None:
+            self.on_track_evicted(tracker_id, vehicle_state)
+
+    def _plate_confidence(self, tracker_id):
+        vehicle_state = self.vehicle_states.get(tracker_id)
+        return vehicle_state.number_plate_confidence if vehicle_state else 0
 
     def send_alert(self, tracker_id, speed, number_plate):
-        current_time = t.time()
+        """
+        Queues the number plate and overspeeding alerts of a track, at most one of each per
+        30 seconds. Sending (merging, batching, retries) happens on the dispatcher's thread.
+        """
         vehicle_state = self.vehicle_states.get(tracker_id)
+        if vehicle_state is None:
+            return
+        current_time = t.time()
+        number_plate = number_plate or vehicle_state.number_plate
+
+        # Check for number plate alert
+        if (
+            number_plate
+            and current_time - vehicle_state.last_request_time_numberplate >= 30
+        ):
+            vehicle_state.last_request_time_numberplate = current_time
+            print(f"Number plate alert for tracker ID {tracker_id}: {number_plate}")
+            self.alert_dispatcher.submit(
+                tracker_id, "number_plate", speed, number_plate, current_time
+            )
 
-        if vehicle_state:
-            # Check for number plate alert
-            last_request_time_numberplate = vehicle_state.last_request_time_numberplate
-            if number_plate and current_time - last_request_time_numberplate >= 30:
-                self.vehicle_states[tracker_id].last_request_time_numberplate = (
-                    current_time
-                )
-                print(f"Number plate alert for tracker ID {tracker_id}: {number_plate}")
-                # payload = {
-                #     "tracker_id": tracker_id,
-                #     "speed": speed,
-                #     "number_plate": number_plate,
-                # }
-                # try:
-                #     response = requests.post(self.api_url, json=payload)
-                #     if response.status_code == 200:
-                #         print(f"Number plate alert sent successfully for tracker ID {tracker_id}")
-                #     else:
-                #         print(f"Failed to send number plate alert for tracker ID {tracker_id}: {response.text}")
-                # except requests.RequestException as e:
-                #     print(f"Error sending number plate alert: {e}")
-
-            # Check for overspeeding alert
-            last_request_time_overspeeding = (
-                vehicle_state.last_request_time_overspeeding
+        # Check for overspeeding alert, the dispatcher holds it back briefly if the
+        # plate is not read yet
+        if (
+            speed > 30
+            and current_time - vehicle_state.last_request_time_overspeeding >= 30
+        ):
+            vehicle_state.last_request_time_overspeeding = current_time
+            print(
+                f"Overspeeding alert for tracker ID {tracker_id}: {speed} km/h | {number_plate}"
+            )
+            self.alert_dispatcher.submit(
+                tracker_id, "overspeeding", speed, number_plate, current_time
             )
 
-            if speed > 30 and current_time - last_request_time_overspeeding >= 30:
-                if self.vehicle_states[tracker_id].number_plate or (
-                    number_plate and vehicle_state.number_plate_confidence > 0.95
-                ):
-                    self.vehicle_states[tracker_id].last_request_time_overspeeding = (
-                        current_time
-                    )
-                    print(
-                        f"Overspeeding alert for tracker ID {tracker_id}: {speed} km/h | {number_plate or self.vehicle_states[tracker_id].number_plate }"
-                    )
-                    if tracker_id in self.request_schuler:
-                        self.request_schuler.remove(tracker_id)
-                # payload = {
-                #     "tracker_id": tracker_id,
-                #     "speed": speed,
-                #     "number_plate": number_plate if number_plate else "",
-                # }
-                # try:
-                #     response = requests.post(self.api_url, json=payload)
-                #     if response.status_code == 200:
-                #         print(f"Overspeeding alert sent successfully for tracker ID {tracker_id}")
-                #     else:
-                #         print(f"Failed to send overspeeding alert for tracker ID {tracker_id}: {response.text}")
-                # except requests.RequestException as e:
-                #     print(f"Error sending overspeeding alert: {e}")
-                else:
-                    self.request_schuler.add(tracker_id)
-                    print(f"Scheduled update for tracker ID {tracker_id}")
-
-            for i in list(self.request_schuler):
-                num = self.vehicle_states[i].number_plate
-                if (
-                    num
-                    or (
-                        current_time - vehicle_state.last_update >= 4
-                        or self.vehicle_states[i].number_plate_confidence > 0.95
-                    )
-                    and i in self.request_schuler
-                ):
-                    self.send_alert(i, self.vehicle_states[i].max_speed, num)
-                    # self.request_schuler.remove(i)
-                else:
-                    print(
-                        f"Tracker ID {i} not updated as {current_time - vehicle_state.last_update} or {num} with {self.vehicle_states[i].number_plate_confidence}"
-                    )
+    def frames(self, timestamps=False):
+        """
+        Returns the frame source of the video: a LatestFrameCapture for live streams, which
+        always hands out the newest frame and reconnects, or a plain decoder for files.
+        With `timestamps`, it yields (frame, timestamp) pairs for `process_frame`: the
+        capture time for live streams, the presentation timestamp for files.
+        """
+        if is_live_source(self.video_path):
+            return LatestFrameCapture(self.video_path, timestamps=timestamps)
+        if timestamps:
+            return timestamped_video_frames(self.video_path)
+        return sv.get_video_frames_generator(self.video_path)
+
+    def run(self, threaded=True, drop_frames=False, queue_size=4):
+        """
+        Plays the video with the annotations. With `threaded`, decoding, inference,
+        tracking and annotation run as separate stages connected by bounded queues;
+        `drop_frames` drops the oldest decoded frames when inference falls behind a
+        live source.
+        """
+        frame_generator = self.frames(timestamps=True)
+        if threaded:
+            pipeline = FramePipeline(
+                frame_generator,
+                [
+                    # (frame, timestamp) -> (frame, timestamp, detections, detector time)
+                    lambda item: (*item, *self.detect(item[0])),
+                    lambda item: (item[0], *self.track(item[0], *item[2:], item[1])),
+                    lambda item: cv2.resize(self.annotate(*item), (1280, 720)),
+                ],
+                queue_size=queue_size,
+                drop_oldest=drop_frames,
+            )
+            frames = iter(pipeline)
+        else:
+            pipeline = None
+            frames = (
+                cv2.resize(self.process_frame(frame, timestamp)[0], (1280, 720))
+                for frame, timestamp in frame_generator
+            )
 
-    def run(self):
-        frame_generator = sv.get_video_frames_generator(self.video_path)
-        for frame_idx, frame in enumerate(frame_generator):
-            processed_frame, _ = self.process_frame(frame)
-            frame = cv2.resize(processed_frame, (1280, 720))
-            cv2.imshow("Frame", frame)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
-        cv2.destroyAllWindows()
+        try:
+            for frame in frames:
+                cv2.imshow("Frame", frame)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+        finally:
+            if pipeline is not None:
+                pipeline.stop()
+                if pipeline.dropped_frames:
+                    print(f"Dropped {pipeline.dropped_frames} frames to keep up")
+            cv2.destroyAllWindows()
+            if isinstance(frame_generator, LatestFrameCapture):
+                frame_generator.release()
+                print(f"Capture: {frame_generator.stats()}")
+            # Hand the remaining tracks to the eviction callback
+            self.vehicle_states.flush()
+            self.alert_dispatcher.close()
+
+
+def points_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Returns a boolean mask of the points lying inside the polygon (ray casting)."""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    polygon = np.asarray(polygon, dtype=np.float32)
+    x, y = points[:, 0:1], points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+
+    # Count the polygon edges crossed by a horizontal ray going right from each point
+    straddles = (y1 <= y) != (y2 <= y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    crossings = straddles & (x < crossing_x)
+    return np.count_nonzero(crossings, axis=1) % 2 == 1
 
 
 class ViewTransformer:
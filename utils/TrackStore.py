@@ -0,0 +1,91 @@
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+
+class TrackStore(MutableMapping):
+    def __init__(self, ttl=60.0, max_entries=None, on_evict=None, default_factory=None):
+        """
+        Dictionary of per-track data that forgets tracks which have not been seen for a while.
+
+        Args:
+            ttl (float): Seconds since a track was last seen after which it is evicted (None disables it).
+            max_entries (int): Keep at most this many tracks, evicting the least recently seen ones.
+            on_evict (callable): Called with (key, value) before a track is dropped, e.g. to export it.
+            default_factory (callable): Creates the value of a missing key on access, like defaultdict.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self.default_factory = default_factory
+
+        self.entries = OrderedDict()  # key -> value, least recently seen first
+        self.last_seen = {}  # key -> time the track was last seen
+
+    def __getitem__(self, key):
+        if key not in self.entries and self.default_factory is not None:
+            self[key] = self.default_factory()
+        return self.entries[key]
+
+    def __setitem__(self, key, value):
+        self.entries[key] = value
+        self.touch(key)
+
+    def __delitem__(self, key):
+        del self.entries[key]
+        del self.last_seen[key]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        # Unlike item access, never creates a value with the default factory
+        return self.entries.get(key, default)
+
+    def pop(self, key, *default):
+        if key not in self.entries and default:
+            return default[0]
+        value = self.entries.pop(key)
+        del self.last_seen[key]
+        return value
+
+    def touch(self, key, now=None):
+        """Marks the track as seen now."""
+        if key not in self.entries:
+            return
+        self.entries.move_to_end(key)
+        self.last_seen[key] = time.time() if now is None else now
+
+        if self.max_entries is not None:
+            while len(self.entries) > self.max_entries:
+                self.evict(next(iter(self.entries)))
+
+    def evict(self, key):
+        """Drops a track, handing it to the eviction callback first."""
+        value = self.entries.pop(key)
+        del self.last_seen[key]
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def evict_expired(self, now=None):
+        """Drops every track that has not been seen for longer than the TTL."""
+        if self.ttl is None:
+            return
+        now = time.time() if now is None else now
+        # Entries are ordered by last seen time, so stop at the first fresh one
+        while self.entries:
+            key = next(iter(self.entries))
+            if now - self.last_seen[key] <= self.ttl:
+                break
+            self.evict(key)
+
+    def flush(self):
+        """Evicts every track, e.g. on shutdown so the callback sees all of them."""
+        for key in list(self.entries):
+            self.evict(key)
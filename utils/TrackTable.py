@@ -0,0 +1,200 @@
+import warnings
+
+import numpy as np
+
+
+class TrackTable:
+    def __init__(
+        self,
+        history=30,
+        min_samples=2,
+        capacity=64,
+        speed_history=64,
+        ema_alpha=0.2,
+        percentile=85,
+    ):
+        """
+        Struct-of-arrays table of the recent positions of every track, so the speeds of all
+        tracks of a frame come out of one NumPy pass. Each track owns one row of fixed-size
+        ring buffers; memory per track is bounded and rows are reused once a track is removed.
+
+        Args:
+            history (int): Samples of position and time kept per track.
+            min_samples (int): Samples a track needs before it gets a speed.
+            capacity (int): Initial number of rows, doubled when the table is full.
+            speed_history (int): Recent speeds kept per track for the percentile.
+            ema_alpha (float): Weight of the newest speed in the exponential moving average.
+            percentile (float): Percentile of the recent speeds reported in the summary.
+        """
+        self.history = history
+        self.min_samples = max(2, min_samples)
+        self.speed_history = speed_history
+        self.ema_alpha = ema_alpha
+        self.percentile = percentile
+
+        self.rows = {}  # tracker id -> row index
+        self.free_rows = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.positions = np.zeros((capacity, self.history), dtype=np.float32)
+        # float64: epoch seconds in float32 would lose the frame spacing within days of uptime
+        self.timestamps = np.zeros((capacity, self.history), dtype=np.float64)
+        self.counts = np.zeros(capacity, dtype=np.int64)  # samples ever written per row
+        self.max_speed = np.zeros(capacity, dtype=np.float32)
+        self.ema_speed = np.zeros(capacity, dtype=np.float32)
+        self.speeds = np.full((capacity, self.speed_history), np.nan, dtype=np.float32)
+        self.speed_counts = np.zeros(capacity, dtype=np.int64)
+        self.free_rows = list(range(capacity - 1, -1, -1))
+
+    def _grow(self):
+        old = (
+            self.positions,
+            self.timestamps,
+            self.counts,
+            self.max_speed,
+            self.ema_speed,
+            self.speeds,
+            self.speed_counts,
+        )
+        old_capacity = self.capacity
+        self._allocate(old_capacity * 2)
+        for new, previous in zip(
+            (
+                self.positions,
+                self.timestamps,
+                self.counts,
+                self.max_speed,
+                self.ema_speed,
+                self.speeds,
+                self.speed_counts,
+            ),
+            old,
+        ):
+            new[:old_capacity] = previous
+        self.free_rows = list(range(self.capacity - 1, old_capacity - 1, -1))
+
+    def _reset(self, row):
+        self.counts[row] = 0
+        self.max_speed[row] = 0
+        self.ema_speed[row] = 0
+        self.speeds[row] = np.nan
+        self.speed_counts[row] = 0
+
+    def row(self, tracker_id):
+        """Returns the row of a track, claiming a free one for a new track."""
+        row = self.rows.get(tracker_id)
+        if row is None:
+            if not self.free_rows:
+                self._grow()
+            row = self.free_rows.pop()
+            self._reset(row)
+            self.rows[tracker_id] = row
+        return row
+
+    def __contains__(self, tracker_id):
+        return tracker_id in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def remove(self, tracker_id):
+        """Frees the row of a track that is gone."""
+        row = self.rows.pop(tracker_id, None)
+        if row is not None:
+            self.free_rows.append(row)
+
+    def update(self, tracker_ids, positions, timestamp):
+        """
+        Appends the position of every given track at `timestamp` (seconds) and returns their
+        speeds in position units per second, in the order given; NaN for tracks with fewer
+        than `min_samples` samples. Timestamps may be unevenly spaced (dropped or skipped
+        frames, variable frame rate sources), the speed is fitted against them.
+        """
+        if len(tracker_ids) == 0:
+            return np.empty(0, dtype=np.float32)
+
+        rows = np.fromiter(
+            (self.row(tracker_id) for tracker_id in tracker_ids),
+            dtype=np.int64,
+            count=len(tracker_ids),
+        )
+        heads = self.counts[rows] % self.history
+        self.positions[rows, heads] = positions
+        self.timestamps[rows, heads] = timestamp
+        self.counts[rows] += 1
+
+        speeds = self._speeds(rows)
+        self._summarize(rows, speeds)
+        return speeds
+
+    def _speeds(self, rows):
+        # Least squares slope of position over time of each row's window, so one noisy
+        # sample or an irregular gap between samples does not swing the speed
+        samples = np.minimum(self.counts[rows], self.history)
+        # Until a ring wraps, its samples sit in the first `samples` slots
+        valid = np.arange(self.history) < samples[:, None]
+
+        times = self.timestamps[rows]
+        positions = self.positions[rows].astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            time_mean = np.sum(times * valid, axis=1) / samples
+            position_mean = np.sum(positions * valid, axis=1) / samples
+            time_offsets = (times - time_mean[:, None]) * valid
+            covariance = np.sum(
+                time_offsets * (positions - position_mean[:, None]), axis=1
+            )
+            variance = np.sum(time_offsets**2, axis=1)
+            speeds = np.abs(covariance / variance).astype(np.float32)
+
+        speeds[(samples < self.min_samples) | (variance <= 0)] = np.nan
+        return speeds
+
+    def _summarize(self, rows, speeds):
+        valid = ~np.isnan(speeds)
+        rows, speeds = rows[valid], speeds[valid]
+        if len(rows) == 0:
+            return
+
+        self.max_speed[rows] = np.maximum(self.max_speed[rows], speeds)
+        first = self.speed_counts[rows] == 0
+        self.ema_speed[rows] = np.where(
+            first,
+            speeds,
+            self.ema_speed[rows] + self.ema_alpha * (speeds - self.ema_speed[rows]),
+        )
+        self.speeds[rows, self.speed_counts[rows] % self.speed_history] = speeds
+        self.speed_counts[rows] += 1
+
+    def summaries(self, tracker_ids):
+        """
+        Returns the max, EMA and percentile speed of the given (known) tracks as three
+        arrays in one pass; 0 for tracks without a speed yet.
+        """
+        rows = np.fromiter(
+            (self.rows[tracker_id] for tracker_id in tracker_ids),
+            dtype=np.int64,
+            count=len(tracker_ids),
+        )
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # rows without speeds
+            percentile_speed = np.nanpercentile(
+                self.speeds[rows], self.percentile, axis=1
+            )
+        return (
+            self.max_speed[rows],
+            self.ema_speed[rows],
+            np.nan_to_num(percentile_speed).astype(np.float32),
+        )
+
+    def summary(self, tracker_id):
+        """Returns the max, EMA and percentile speed of a track, or None if it is unknown."""
+        if tracker_id not in self.rows:
+            return None
+        max_speed, ema_speed, percentile_speed = self.summaries([tracker_id])
+        return {
+            "max_speed": float(max_speed[0]),
+            "ema_speed": float(ema_speed[0]),
+            "percentile_speed": float(percentile_speed[0]),
+        }
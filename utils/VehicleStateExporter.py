@@ -1,10 +1,11 @@
-import openpyxl
-from openpyxl.drawing.image import Image as OpenpyxlImage
 import os
 import cv2
 
+
 class VehicleStateExporter:
-    def __init__(self, output_folder="output_excel", excel_file_name="vehicle_states.xlsx"):
+    def __init__(
+        self, output_folder="output_excel", excel_file_name="vehicle_states.xlsx"
+    ):
         """
         Initialize the Excel exporter with output folder and file name.
         """
@@ -13,6 +14,8 @@ class VehicleStateExporter:
         os.makedirs(self.output_folder, exist_ok=True)  # Ensure output folder exists
 
         # Initialize the Excel workbook and worksheet
+        import openpyxl  # only needed when exporting
+
         self.workbook = openpyxl.Workbook()
         self.sheet = self.workbook.active
         self.sheet.title = "Vehicle States"
@@ -27,7 +30,7 @@ class VehicleStateExporter:
     def add_vehicle_state(self, tracker_id, max_speed, number_plate, image):
         """
         Add vehicle state information and image to the Excel file.
-        
+
         Args:
             tracker_id (int): The ID of the tracked vehicle.
             max_speed (float): The maximum speed of the vehicle.
@@ -43,11 +46,17 @@ class VehicleStateExporter:
 
         # Add vehicle state information to Excel
         self.sheet.cell(row=self.row_num, column=1, value=tracker_id)  # Tracker ID
-        self.sheet.cell(row=self.row_num, column=2, value=round(max_speed, 2))  # Max Speed
-        self.sheet.cell(row=self.row_num, column=3, value=number_plate or "N/A")  # Number Plate
+        self.sheet.cell(
+            row=self.row_num, column=2, value=round(max_speed, 2)
+        )  # Max Speed
+        self.sheet.cell(
+            row=self.row_num, column=3, value=number_plate or "N/A"
+        )  # Number Plate
 
         # Insert the vehicle image
         if image_path:
+            from openpyxl.drawing.image import Image as OpenpyxlImage
+
             img = OpenpyxlImage(image_path)
             img.width, img.height = 80, 50  # Resize image to fit Excel cell
             self.sheet.add_image(img, f"D{self.row_num}")  # Add image to column D